@@ -0,0 +1,282 @@
+"""离线性能基准测试
+
+在本地启动模拟洛谷的服务器，测量模型获取的吞吐量、延迟、内存峰值和解析耗时::
+
+    python -m benchmarks --latency 0.02 --requests 200 --concurrency 8
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from time import perf_counter, process_time
+
+import luogu
+from luogu.mirror import PROBLEM_LIST_SCHEMA
+from luogu.utils import (
+    JSON_BACKEND,
+    LazyList,
+    cached_property,
+    decode,
+    extract_csrf_token,
+    get_csrf_token,
+    loads,
+    project,
+)
+
+from .server import DATA, load, patch, serve
+
+Result = namedtuple("Result", ("name", "requests", "seconds", "p50", "p99", "peak"))
+
+
+def percentile(values: "list[float]", q: float) -> float:
+    values = sorted(values)
+    return values[round(q * (len(values) - 1))]
+
+
+def measure(name: str, func, args: list, concurrency: int) -> Result:
+    """并发调用 ``func(arg)``，返回吞吐量、延迟和内存峰值"""
+    latencies = []
+
+    def timed(arg):
+        start = perf_counter()
+        func(arg)
+        latencies.append(perf_counter() - start)
+
+    gc.collect()
+    start = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(timed, args))
+    seconds = perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(func, args))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return Result(
+        name,
+        len(args),
+        seconds,
+        percentile(latencies, 0.5),
+        percentile(latencies, 0.99),
+        peak,
+    )
+
+
+def measure_iter(name: str, iterable) -> Result:
+    """迭代 ``iterable()``，以相邻元素的间隔作为延迟"""
+    gc.collect()
+    latencies = []
+    start = last = perf_counter()
+    for _ in iterable():
+        now = perf_counter()
+        latencies.append(now - last)
+        last = now
+
+    gc.collect()
+    tracemalloc.start()
+    for _ in iterable():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return Result(
+        name,
+        len(latencies),
+        last - start,
+        percentile(latencies, 0.5),
+        percentile(latencies, 0.99),
+        peak,
+    )
+
+
+def fields(model: type) -> "list[str]":
+    """模型中不会触发请求的公开字段"""
+    return [
+        name
+        for name in dir(model)
+        if not name.startswith("_")
+        and name not in ("provider", "user", "fingerprint")
+        and isinstance(getattr(model, name), cached_property)
+    ]
+
+
+def parse(model: type, name: str, repeat: int) -> "tuple[float, float, float]":
+    """解析录制数据的 CPU 耗时（秒/次）
+
+    :returns: 标准库 JSON 解码耗时、:data:`luogu.utils.JSON_BACKEND` 解码耗时
+        和模型字段解析耗时
+    """
+    raw = (DATA / f"{name}.json").read_bytes()
+    current_data = load(name)["currentData"]
+    names = fields(model)
+
+    decode = []
+    for func in (json.loads, loads):
+        start = process_time()
+        for _ in range(repeat):
+            func(raw)
+        decode.append((process_time() - start) / repeat)
+
+    start = process_time()
+    for _ in range(repeat):
+        instance = model.from_current_data(current_data)
+        for field in names:
+            getattr(instance, field)
+    return (*decode, (process_time() - start) / repeat)
+
+
+def html_parser_csrf_token(text: str) -> "str | None":
+    """0.1 版本中基于 :class:`html.parser.HTMLParser` 的实现，用于对比"""
+
+    class HTMLCSRFTokenParser(HTMLParser):
+        def handle_starttag(self, tag, attrs):
+            attrs = dict(attrs)
+            try:
+                if tag == "meta" and attrs["name"] == "csrf-token":
+                    raise StopIteration(attrs["content"])
+            except KeyError:
+                pass
+
+    try:
+        HTMLCSRFTokenParser().feed(text)
+    except StopIteration as csrf_token:
+        return str(csrf_token)
+
+
+def csrf(repeat: int) -> "tuple[float, float]":
+    """从首页提取 CSRF 令牌的 CPU 耗时（秒/次）
+
+    :returns: :class:`~html.parser.HTMLParser` 解析整个页面和流式提取的耗时
+    """
+    raw = (DATA / "index.html").read_bytes()
+
+    start = process_time()
+    for _ in range(repeat):
+        html_parser_csrf_token(raw.decode())
+    parser = (process_time() - start) / repeat
+
+    start = process_time()
+    for _ in range(repeat):
+        extract_csrf_token(raw[i : i + 4096] for i in range(0, len(raw), 4096))
+    return parser, (process_time() - start) / repeat
+
+
+def schema(repeat: int) -> "tuple[float, float]":
+    """按 :data:`~luogu.mirror.PROBLEM_LIST_SCHEMA` 解码一页题目列表的 CPU 耗时（秒/次）
+
+    :returns: 完整解码后裁剪和 :func:`~luogu.utils.decode` 的耗时
+    """
+    problem = load("problem")["currentData"]["problem"]
+    result = [
+        {**problem, "pid": f"P{1000 + i}", "totalSubmit": i, "totalAccepted": i}
+        for i in range(50)
+    ]
+    raw = json.dumps(
+        {"code": 200, "currentData": {"problems": {"result": result, "count": 50}}}
+    ).encode()
+
+    start = process_time()
+    for _ in range(repeat):
+        project(loads(raw), PROBLEM_LIST_SCHEMA)
+    full = (process_time() - start) / repeat
+
+    start = process_time()
+    for _ in range(repeat):
+        decode(raw, PROBLEM_LIST_SCHEMA)
+    return full, (process_time() - start) / repeat
+
+
+def mirror(s: luogu.Session, concurrency: int) -> "list[tuple[str, int, float]]":
+    """完整同步和增量同步镜像的耗时
+
+    :returns: ``(名称, 获取的题目数, 秒)``
+    """
+    results = []
+    with luogu.Mirror(":memory:", s, concurrency) as m:
+        for name in ("full", "incremental"):
+            start = perf_counter()
+            fetched = m.sync_problems()
+            results.append((name, fetched, perf_counter() - start))
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--latency", type=float, default=0.01, help="服务器延迟（秒）")
+    parser.add_argument("--requests", type=int, default=200, help="每项请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发线程数")
+    parser.add_argument("--repeat", type=int, default=2000, help="解析重复次数")
+    args = parser.parse_args(argv)
+
+    n = args.requests
+    with serve(args.latency) as url:
+        s = luogu.Session(pool_maxsize=args.concurrency, backoff=None)
+        patch(s.session, url)
+        results = [
+            measure("User", s.User, range(1, n + 1), args.concurrency),
+            measure("Problem", s.Problem, [f"P{i}" for i in range(n)], 1),
+            measure(
+                "Problem (concurrent)",
+                s.Problem,
+                [f"P{i}" for i in range(n)],
+                args.concurrency,
+            ),
+            measure("Paste", s.Paste, [f"{i:08x}" for i in range(n)], 1),
+            measure("User.search", s.User.search, ["kkksc03"] * n, 1),
+            measure("get_csrf_token", get_csrf_token, [s.session] * n, 1),
+        ]
+        pids = [f"P{i}" for i in range(n)]
+        for window in (0, args.concurrency):
+            results.append(
+                measure_iter(
+                    f"LazyList (window={window})",
+                    lambda: LazyList(s.Problem, pids, window),
+                )
+            )
+        syncs = mirror(s, args.concurrency)
+
+    print(
+        f"{'benchmark':<24}{'requests':>9}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>10}"
+    )
+    for r in results:
+        print(
+            f"{r.name:<24}{r.requests:>9}{r.requests / r.seconds:>10.1f}"
+            f"{r.p50 * 1000:>10.2f}{r.p99 * 1000:>10.2f}{r.peak / 1024:>10.1f}"
+        )
+
+    print()
+    print(f"{'mirror sync':<24}{'problems':>9}{'seconds':>10}")
+    for name, fetched, seconds in syncs:
+        print(f"{name:<24}{fetched:>9}{seconds:>10.2f}")
+
+    print()
+    print(f"{'parse us':<24}{'json':>10}{JSON_BACKEND:>10}{'fields':>10}")
+    for model, name in (
+        (luogu.User, "user"),
+        (luogu.Problem, "problem"),
+        (luogu.Paste, "paste"),
+    ):
+        times = parse(model, name, args.repeat)
+        print(f"{model.__name__:<24}" + "".join(f"{t * 1e6:>10.1f}" for t in times))
+
+    print()
+    full, typed = schema(max(1, args.repeat // 10))
+    print(f"{'problem list':<24}{'us':>10}")
+    print(f"{'loads + project':<24}{full * 1e6:>10.1f}")
+    print(f"{'decode':<24}{typed * 1e6:>10.1f}")
+
+    print()
+    parser, streaming = csrf(max(1, args.repeat // 10))
+    print(f"{'csrf token':<24}{'us':>10}")
+    print(f"{'HTMLParser':<24}{parser * 1e6:>10.1f}")
+    print(f"{'extract_csrf_token':<24}{streaming * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
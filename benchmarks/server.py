@@ -0,0 +1,181 @@
+"""模拟洛谷的本地服务器，返回录制的 ``currentData``"""
+
+import copy
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+
+from luogu.adapters import LuoguAdapter
+
+LUOGU = "https://www.luogu.com.cn"
+DATA = Path(__file__).parent / "data"
+
+
+def load(name: str):
+    return json.loads((DATA / f"{name}.json").read_text("utf-8"))
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端读到 CSRF 令牌后会提前关闭连接
+        pass
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    problem_count = 1000
+    per_page = 50
+    # 题目 ID 到额外提交数的映射，用于模拟题目列表的变化
+    submissions: "dict[str, int]" = {}
+    user = load("user")
+    problem = load("problem")
+    paste = load("paste")
+    search = load("search")
+    index = (DATA / "index.html").read_bytes()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, body: bytes, content_type: str = "application/json") -> None:
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_model(self, data, section: str, key: str, value) -> None:
+        data = copy.deepcopy(data)
+        data["currentData"][section][key] = value
+        self.send(json.dumps(data, ensure_ascii=False).encode())
+
+    def send_problem_list(self, query: str) -> None:
+        page = int(parse_qs(query).get("page", ["1"])[0])
+        start = (page - 1) * self.per_page
+        result = [
+            {
+                "pid": f"P{1000 + i}",
+                "title": f"题目 {i}",
+                "difficulty": i % 8,
+                "type": "P",
+                "totalSubmit": 100 + i + self.submissions.get(f"P{1000 + i}", 0),
+                "totalAccepted": 50 + i,
+            }
+            for i in range(start, min(start + self.per_page, self.problem_count))
+        ]
+        problems = {
+            "result": result,
+            "count": self.problem_count,
+            "perPage": self.per_page,
+        }
+        self.send(
+            json.dumps({"code": 200, "currentData": {"problems": problems}}).encode()
+        )
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path
+        if path == "/problem/list":
+            return self.send_problem_list(url.query)
+        m = re.fullmatch(r"/(user|problem|paste)/(\w+)", path)
+        if m is None:
+            if path == "/api/user/search":
+                self.send(json.dumps(self.search).encode())
+            else:
+                self.send(self.index, "text/html; charset=utf-8")
+        elif m[1] == "user":
+            self.send_model(self.user, "user", "uid", int(m[2]))
+        elif m[1] == "problem":
+            self.send_model(self.problem, "problem", "pid", m[2])
+        else:
+            self.send_model(self.paste, "paste", "id", m[2])
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send(b'{"id": "a1b2c3d4"}')
+
+
+@contextmanager
+def serve(latency: float = 0.0, handler: type = Handler):
+    """在后台线程中启动服务器
+
+    :param float latency: 每个请求的额外延迟（秒）
+    :param type handler: 请求处理类，可为修改了数据的 :class:`Handler` 子类
+
+    :returns: 服务器地址，如 ``http://127.0.0.1:8000``
+    """
+    handler = type("Handler", (handler,), {"latency": latency})
+    server = Server(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://{}:{}".format(*server.server_address)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class LocalAdapter(LuoguAdapter):
+    """将发往洛谷的请求转发至本地服务器"""
+
+    def __init__(self, base_url: str, adapter: LuoguAdapter) -> None:
+        super().__init__(
+            adapter.rate_limiter,
+            adapter.backoff,
+            adapter.timeout,
+            adapter.hooks,
+            pool_connections=adapter._pool_connections,
+            pool_maxsize=adapter._pool_maxsize,
+            pool_block=adapter._pool_block,
+        )
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        request.url = self.base_url + request.url[len(LUOGU) :]
+        return super().send(request, **kwargs)
+
+
+def patch(session, base_url: str) -> None:
+    """使 :class:`requests.Session` 将发往洛谷的请求转发至 *base_url*"""
+    session.mount(LUOGU, LocalAdapter(base_url, session.get_adapter(LUOGU)))
+
+
+class LocalTransport:
+    """将 :class:`~luogu.adapters.AsyncLuoguTransport` 发出的请求转发至本地服务器"""
+
+    def __init__(self, base_url: str, transport) -> None:
+        self.base_url = urlsplit(base_url)
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        request.url = request.url.copy_with(
+            scheme=self.base_url.scheme,
+            host=self.base_url.hostname,
+            port=self.base_url.port,
+        )
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def patch_async(client, base_url: str) -> None:
+    """使 :class:`luogu.AsyncSession` 的 *client* 将请求转发至 *base_url*"""
+    transport = client._transport
+    transport.transport = LocalTransport(base_url, transport.transport)
+
+
+if __name__ == "__main__":
+    with serve() as url:
+        print(f"Serving on {url}")
+        threading.Event().wait()
@@ -7,19 +7,43 @@ A model-based Python implement for Luogu API client
 洛谷 API 客户端基于模型的 Python 实现
 """
 
-from .exceptions import AccessDeniedHttpException, HttpException, NotFoundHttpException
+from .cache import MemoryCache, SQLiteCache
+from .columns import ModelList
+from .exceptions import (
+    AccessDeniedHttpException,
+    CSRFTokenNotFoundException,
+    HttpException,
+    NotFoundHttpException,
+)
+from .metrics import Hooks, Metrics
+from .mirror import Mirror
 from .models.main import Problem, User
 from .models.paste import Paste
-from .session import Session
+from .ratelimit import Backoff, TokenBucket
+from .session import AsyncSession, Session, SessionPool, set_default_session
+from .watch import Watcher
 
 __version__ = "0.1.0"
 
 __all__ = (
     "AccessDeniedHttpException",
+    "AsyncSession",
+    "Backoff",
+    "CSRFTokenNotFoundException",
+    "Hooks",
     "HttpException",
+    "MemoryCache",
+    "Metrics",
+    "Mirror",
+    "ModelList",
     "NotFoundHttpException",
     "Paste",
     "Problem",
+    "SQLiteCache",
     "Session",
+    "SessionPool",
+    "TokenBucket",
     "User",
+    "Watcher",
+    "set_default_session",
 )
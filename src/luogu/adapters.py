@@ -0,0 +1,187 @@
+import asyncio
+from time import perf_counter, sleep
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .constants import USER_AGENT
+from .metrics import Hooks
+from .ratelimit import Backoff, TokenBucket
+
+
+class LuoguAdapter(HTTPAdapter):
+    """:class:`requests.Session` 的传输适配器
+
+    发送请求前从限流器获取令牌，并按退避策略重试被限流或失败的请求。
+
+    :param rate_limiter: 限流器，为 :data:`None` 时不限流
+    :type rate_limiter: TokenBucket | None
+    :param backoff: 退避策略，为 :data:`None` 时不重试
+    :type backoff: Backoff | None
+    :param timeout: 未指定超时的请求使用的超时（秒），可为 ``(连接超时, 读取超时)``
+    :type timeout: float | tuple[float, float] | None
+    :param hooks: 请求事件钩子
+    :type hooks: Hooks | None
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + [
+        "rate_limiter",
+        "backoff",
+        "timeout",
+        "hooks",
+    ]
+
+    def __init__(
+        self,
+        rate_limiter: "TokenBucket | None" = None,
+        backoff: "Backoff | None" = None,
+        timeout: "float | tuple[float, float] | None" = None,
+        hooks: "Hooks | None" = None,
+        **kwargs
+    ) -> None:
+        self.rate_limiter = rate_limiter
+        self.backoff = backoff
+        self.timeout = timeout
+        self.hooks = hooks
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        hooks = self.hooks or Hooks()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            hooks.emit("request", request)
+            start = perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except Exception as e:
+                hooks.emit("error", request, e)
+                raise
+            hooks.emit("response", request, response, perf_counter() - start)
+            if self.rate_limiter is not None:
+                self.rate_limiter.feedback(response.status_code)
+            if self.backoff is None or not self.backoff.should_retry(
+                request.method, response.status_code, attempt
+            ):
+                return response
+            delay = self.backoff.delay(attempt, response.headers)
+            if delay is None:
+                return response
+            hooks.emit("retry", request, response)
+            response.close()
+            sleep(delay)
+            attempt += 1
+
+
+def make_session(
+    rate_limiter: "TokenBucket | None" = None,
+    backoff: "Backoff | None" = Backoff(),
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    pool_block: bool = False,
+    timeout: "float | tuple[float, float] | None" = None,
+    compression: bool = True,
+    keep_alive: bool = True,
+    hooks: "Hooks | None" = None,
+) -> requests.Session:
+    """创建挂载了 :class:`LuoguAdapter` 的 :class:`requests.Session`
+
+    :param rate_limiter: 限流器，为 :data:`None` 时不限流
+    :type rate_limiter: TokenBucket | None
+    :param backoff: 退避策略，为 :data:`None` 时不重试
+    :type backoff: Backoff | None
+    :param int pool_connections: 缓存的连接池（主机）数量
+    :param int pool_maxsize: 每个主机的最大连接数，多线程并发时应不小于线程数
+    :param bool pool_block: 值为真时，连接数达到上限后等待空闲连接；
+        否则新建连接且用完后丢弃
+    :param timeout: 请求超时（秒），可为 ``(连接超时, 读取超时)``
+    :type timeout: float | tuple[float, float] | None
+    :param bool compression: 是否接受压缩的响应
+    :param bool keep_alive: 是否复用连接
+    :param hooks: 请求事件钩子
+    :type hooks: Hooks | None
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    if not compression:
+        session.headers["Accept-Encoding"] = "identity"
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    adapter = LuoguAdapter(
+        rate_limiter,
+        backoff,
+        timeout,
+        hooks,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class AsyncLuoguTransport:
+    """:class:`httpx.AsyncClient` 的传输层，功能同 :class:`LuoguAdapter`
+
+    :param transport: 实际发送请求的 :class:`httpx.AsyncHTTPTransport`
+    :param rate_limiter: 限流器，为 :data:`None` 时不限流
+    :type rate_limiter: TokenBucket | None
+    :param backoff: 退避策略，为 :data:`None` 时不重试
+    :type backoff: Backoff | None
+    :param hooks: 请求事件钩子
+    :type hooks: Hooks | None
+    """
+
+    def __init__(
+        self,
+        transport,
+        rate_limiter: "TokenBucket | None" = None,
+        backoff: "Backoff | None" = None,
+        hooks: "Hooks | None" = None,
+    ) -> None:
+        self.transport = transport
+        self.rate_limiter = rate_limiter
+        self.backoff = backoff
+        self.hooks = hooks
+
+    async def handle_async_request(self, request):
+        hooks = self.hooks or Hooks()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            hooks.emit("request", request)
+            start = perf_counter()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except Exception as e:
+                hooks.emit("error", request, e)
+                raise
+            hooks.emit("response", request, response, perf_counter() - start)
+            if self.rate_limiter is not None:
+                self.rate_limiter.feedback(response.status_code)
+            if self.backoff is None or not self.backoff.should_retry(
+                request.method, response.status_code, attempt
+            ):
+                return response
+            delay = self.backoff.delay(attempt, response.headers)
+            if delay is None:
+                return response
+            hooks.emit("retry", request, response)
+            await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    async def __aenter__(self) -> "AsyncLuoguTransport":
+        await self.transport.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.transport.__aexit__(*exc_info)
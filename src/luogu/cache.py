@@ -0,0 +1,199 @@
+import json
+import sqlite3
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from time import time
+from urllib.parse import urlencode
+
+from .utils import loads
+
+CacheEntry = namedtuple("CacheEntry", ("data", "etag", "last_modified", "time"))
+
+
+class Cache:
+    """响应缓存基类
+
+    以 URL 和查询参数为键缓存 :meth:`Model._get` 的响应数据。
+    缓存过期后，若服务器返回了 ``ETag`` 或 ``Last-Modified``，则发送条件请求，
+    收到 ``304 Not Modified`` 时继续使用缓存的数据。
+
+    :param ttl: 有效期（秒），为 :data:`None` 时永不过期
+    :type ttl: float | None
+
+    :var int hits: 命中次数
+    :var int misses: 未命中次数
+    :var int revalidations: 条件请求确认缓存未修改的次数
+    """
+
+    def __init__(self, ttl: "float | None" = None) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def key(url: str, params: dict = None) -> str:
+        return f"{url}?{urlencode(sorted(params.items()))}" if params else url
+
+    def lookup(self, key: str) -> "tuple[dict[str] | None, dict[str, str]]":
+        """查找缓存
+
+        :returns: 未过期的缓存数据（若有）和条件请求头
+        """
+        entry = self._load(key)
+        if entry is None:
+            return None, {}
+        if self.ttl is None or time() - entry.time < self.ttl:
+            with self._lock:
+                self.hits += 1
+            return entry.data, {}
+        headers = {}
+        if entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+        return None, headers
+
+    def update(self, key: str, response) -> "dict[str] | None":
+        """根据响应更新缓存
+
+        :param response: :class:`requests.Response` 或 :class:`httpx.Response`
+
+        :returns: 响应数据；收到 304 但缓存已在条件请求期间被淘汰时返回 :data:`None`，
+            此时应不带条件请求头重新请求
+        :rtype: dict[str] | None
+        """
+        if response.status_code == 304:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            with self._lock:
+                self.revalidations += 1
+            self._store(key, entry._replace(time=time()))
+            return entry.data
+        data = loads(response.content)
+        with self._lock:
+            self.misses += 1
+        if data.get("code", 200) < 400:
+            self._store(
+                key,
+                CacheEntry(
+                    data,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    time(),
+                ),
+            )
+        return data
+
+    def _load(self, key: str) -> "CacheEntry | None":
+        raise NotImplementedError
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """清空缓存"""
+        raise NotImplementedError
+
+
+class MemoryCache(Cache):
+    """内存 LRU 缓存
+
+    :param maxsize: 最大条目数，为 :data:`None` 时不限制
+    :type maxsize: int | None
+    :param ttl: 有效期（秒），为 :data:`None` 时永不过期
+    :type ttl: float | None
+    """
+
+    def __init__(
+        self, maxsize: "int | None" = 1024, ttl: "float | None" = None
+    ) -> None:
+        super().__init__(ttl)
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(Cache):
+    """SQLite 磁盘缓存，可在多个进程间共享
+
+    :param str path: 数据库文件路径
+    :param maxsize: 最大条目数，超出时淘汰最久未使用的条目，为 :data:`None` 时不限制
+    :type maxsize: int | None
+    :param ttl: 有效期（秒），为 :data:`None` 时永不过期
+    :type ttl: float | None
+    """
+
+    def __init__(
+        self, path: str, maxsize: "int | None" = None, ttl: "float | None" = None
+    ) -> None:
+        super().__init__(ttl)
+        self.maxsize = maxsize
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, data TEXT, etag TEXT, last_modified TEXT, "
+                "time REAL, accessed REAL)"
+            )
+
+    def _load(self, key):
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT data, etag, last_modified, time FROM cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE cache SET accessed = ? WHERE key = ?", (time(), key)
+            )
+        return CacheEntry(json.loads(row[0]), *row[1:])
+
+    def _store(self, key, entry):
+        with self._lock, self._db:
+            self._db.execute(
+                "REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(entry.data), *entry[1:], time()),
+            )
+            if self.maxsize is not None:
+                self._db.execute(
+                    "DELETE FROM cache WHERE key NOT IN "
+                    "(SELECT key FROM cache ORDER BY accessed DESC LIMIT ?)",
+                    (self.maxsize,),
+                )
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self._db.close()
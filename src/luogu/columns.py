@@ -0,0 +1,166 @@
+"""按列导出模型
+
+列中的值直接取自模型的 ``currentData``，不会构造模型的字段；
+时间字段为 Unix 时间戳，转换为 NumPy 或 Arrow 时转为时间类型。
+"""
+
+from datetime import datetime
+from typing import Iterable
+
+from .exceptions import HttpException
+
+
+def _fields(model: type) -> "dict[str]":
+    """模型中由 :func:`~luogu.models.field` 定义的公开字段"""
+    fields = {}
+    for cls in reversed(model.__mro__):
+        for name, attr in vars(cls).items():
+            if hasattr(attr, "key") and hasattr(attr, "convert"):
+                if not name.startswith("_"):
+                    fields[name] = attr
+    return fields
+
+
+def columns(
+    models: Iterable, fields: "Iterable[str] | None" = None
+) -> "tuple[dict[str, list], set[str]]":
+    """将模型转为列
+
+    *models* 中的 ``(ID, 模型或异常)`` 会被解包，异常会被跳过，
+    因此可以直接传入 :meth:`~luogu.models.Model.fetch_many` 的结果。
+
+    :returns: 列名到值的映射，以及其中时间字段的列名
+    """
+    result = None
+    for model in models:
+        if isinstance(model, tuple):
+            model = model[1]
+        if isinstance(model, HttpException):
+            continue
+        if result is None:
+            props = _fields(type(model))
+            names = list(props) if fields is None else list(fields)
+            keys = [props[name].key for name in names]
+            timestamps = {
+                name for name in names if props[name].convert == datetime.fromtimestamp
+            }
+            result = {name: [] for name in names}
+            values = [result[name] for name in names]
+        data = model._data
+        for key, column in zip(keys, values):
+            column.append(data.get(key))
+    if result is None:
+        return {name: [] for name in fields or ()}, set()
+    return result, timestamps
+
+
+def to_numpy(
+    columns: "dict[str, list]", timestamps: "set[str]" = frozenset()
+) -> "dict[str]":
+    """将列转为 :class:`numpy.ndarray`，需要安装 ``numpy``
+
+    整数列中有缺失值时转为浮点数并以 ``nan`` 表示，时间列转为 ``datetime64[s]``，
+    无法转为数值的列为 ``object`` 类型。
+
+    :rtype: dict[str, numpy.ndarray]
+    """
+    import numpy
+
+    arrays = {}
+    for name, values in columns.items():
+        if name in timestamps:
+            arrays[name] = numpy.array(
+                ["NaT" if v is None else v for v in values], dtype="datetime64[s]"
+            )
+            continue
+        types = set(map(type, values))
+        if types <= {bool}:
+            dtype = bool
+        elif types <= {int}:
+            dtype = numpy.int64
+        elif types <= {int, float, type(None)}:
+            dtype = numpy.float64
+            values = [numpy.nan if v is None else v for v in values]
+        else:
+            dtype = object
+        arrays[name] = numpy.array(values, dtype=dtype)
+    return arrays
+
+
+def to_arrow(columns: "dict[str, list]", timestamps: "set[str]" = frozenset()):
+    """将列转为 :class:`pyarrow.Table`，需要安装 ``pyarrow``
+
+    :rtype: pyarrow.Table
+    """
+    import pyarrow
+
+    return pyarrow.table(
+        {
+            name: pyarrow.array(
+                values, pyarrow.timestamp("s") if name in timestamps else None
+            )
+            for name, values in columns.items()
+        }
+    )
+
+
+class Columnar:
+    """可按列导出的模型集合，默认迭代集合中的模型"""
+
+    def _columns(
+        self, fields: "Iterable[str] | None"
+    ) -> "tuple[dict[str, list], set[str]]":
+        return columns(self, fields)
+
+    def to_columns(self, fields: "Iterable[str] | None" = None) -> "dict[str, list]":
+        """导出为列名到值的映射
+
+        :param fields: 导出的字段，为 :data:`None` 时导出所有字段
+        :type fields: Iterable[str] | None
+
+        :rtype: dict[str, list]
+        """
+        return self._columns(fields)[0]
+
+    def to_numpy(self, fields: "Iterable[str] | None" = None) -> "dict[str]":
+        """导出为列名到 :class:`numpy.ndarray` 的映射，需要安装 ``numpy``
+
+        :param fields: 导出的字段，为 :data:`None` 时导出所有字段
+        :type fields: Iterable[str] | None
+
+        :rtype: dict[str, numpy.ndarray]
+        """
+        return to_numpy(*self._columns(fields))
+
+    def to_arrow(self, fields: "Iterable[str] | None" = None):
+        """导出为 :class:`pyarrow.Table`，需要安装 ``pyarrow``
+
+        :param fields: 导出的字段，为 :data:`None` 时导出所有字段
+        :type fields: Iterable[str] | None
+
+        :rtype: pyarrow.Table
+        """
+        return to_arrow(*self._columns(fields))
+
+    def to_parquet(self, path: str, fields: "Iterable[str] | None" = None) -> None:
+        """导出为 Parquet 文件，需要安装 ``pyarrow``
+
+        :param str path: 文件路径
+        :param fields: 导出的字段，为 :data:`None` 时导出所有字段
+        :type fields: Iterable[str] | None
+        """
+        import pyarrow.parquet
+
+        pyarrow.parquet.write_table(self.to_arrow(fields), path)
+
+
+class ModelList(list, Columnar):
+    """可按列导出的模型列表
+
+    .. code:: python
+
+        problems = ModelList(luogu.Problem.fetch_many(pids))
+        table = problems.to_arrow(["pid", "difficulty", "total_accepted"])
+
+    :param models: 模型，或 :meth:`~luogu.models.Model.fetch_many` 的结果
+    """
@@ -8,3 +8,7 @@ class AccessDeniedHttpException(HttpException):
 
 class NotFoundHttpException(HttpException):
     "404"
+
+
+class CSRFTokenNotFoundException(HttpException):
+    "页面中没有 CSRF 令牌"
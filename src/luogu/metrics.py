@@ -0,0 +1,170 @@
+import re
+from bisect import bisect_left
+from threading import Lock
+from urllib.parse import urlsplit
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def endpoint(url) -> str:
+    """将 URL 归一化为端点，路径中包含数字的部分视为 ID
+
+    >>> endpoint("https://www.luogu.com.cn/problem/P1001?a=1")
+    '/problem/{id}'
+    """
+    path = urlsplit(str(url)).path
+    return re.sub(r"(?<=/)[^/]*\d[^/]*", "{id}", path) or "/"
+
+
+class Hooks:
+    """请求事件钩子
+
+    :var list request: ``func(request)``，每次发送请求（包括重试）前调用
+    :var list response: ``func(request, response, seconds)``，每次收到响应后调用
+    :var list error: ``func(request, exception)``，请求发生网络错误时调用
+    :var list retry: ``func(request, response)``，请求将被重试时调用
+    :var list cache: ``func(url, hit)``，查询响应缓存后调用
+    """
+
+    def __init__(self) -> None:
+        self.request = []
+        self.response = []
+        self.error = []
+        self.retry = []
+        self.cache = []
+
+    def emit(self, event: str, *args) -> None:
+        for func in getattr(self, event):
+            func(*args)
+
+
+class Metrics:
+    """请求指标，按请求方法和端点统计请求数、错误数、重试数、延迟分布以及缓存命中
+
+    :param buckets: 延迟直方图的上界（秒）
+    :type buckets: tuple[float, ...]
+    """
+
+    def __init__(self, buckets: "tuple[float, ...]" = BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = Lock()
+        self._endpoints: "dict[tuple[str, str], dict[str]]" = {}
+        self._cache: "dict[str, list[int]]" = {}
+
+    def register(self, hooks: Hooks) -> None:
+        """在 *hooks* 上注册统计函数"""
+        hooks.response.append(self._on_response)
+        hooks.error.append(self._on_error)
+        hooks.retry.append(self._on_retry)
+        hooks.cache.append(self._on_cache)
+
+    def _stats(self, request) -> "dict[str]":
+        key = (request.method, endpoint(request.url))
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = {
+                "requests": 0,
+                "errors": 0,
+                "retries": 0,
+                "status": {},
+                "seconds": 0.0,
+                "buckets": [0] * (len(self.buckets) + 1),
+            }
+        return stats
+
+    def _on_response(self, request, response, seconds: float) -> None:
+        with self._lock:
+            stats = self._stats(request)
+            stats["requests"] += 1
+            status = stats["status"]
+            status[response.status_code] = status.get(response.status_code, 0) + 1
+            stats["seconds"] += seconds
+            stats["buckets"][bisect_left(self.buckets, seconds)] += 1
+
+    def _on_error(self, request, exception: Exception) -> None:
+        with self._lock:
+            self._stats(request)["errors"] += 1
+
+    def _on_retry(self, request, response) -> None:
+        with self._lock:
+            self._stats(request)["retries"] += 1
+
+    def _on_cache(self, url: str, hit: bool) -> None:
+        with self._lock:
+            counts = self._cache.setdefault(endpoint(url), [0, 0])
+            counts[not hit] += 1
+
+    def as_dict(self) -> "dict[str, dict[str]]":
+        """导出为字典
+
+        .. code:: python
+
+            {
+                "requests": {
+                    "GET /user/{id}": {
+                        "requests": 2,
+                        "errors": 0,
+                        "retries": 0,
+                        "status": {200: 2},
+                        "seconds": 0.31,
+                        "latency": {0.005: 0, ..., 0.25: 2, ..., inf: 2},
+                    },
+                },
+                "cache": {"/user/{id}": {"hits": 1, "misses": 1}},
+            }
+        """
+        with self._lock:
+            requests = {}
+            for (method, path), stats in self._endpoints.items():
+                latency, count = {}, 0
+                for le, n in zip(self.buckets + (float("inf"),), stats["buckets"]):
+                    count += n
+                    latency[le] = count
+                requests[f"{method} {path}"] = {
+                    "requests": stats["requests"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "status": dict(stats["status"]),
+                    "seconds": stats["seconds"],
+                    "latency": latency,
+                }
+            cache = {
+                path: {"hits": hits, "misses": misses}
+                for path, (hits, misses) in self._cache.items()
+            }
+        return {"requests": requests, "cache": cache}
+
+    def to_prometheus(self, prefix: str = "luogu") -> str:
+        """导出为 Prometheus 文本格式"""
+        data = self.as_dict()
+        families = {
+            "requests_total": "counter",
+            "request_errors_total": "counter",
+            "request_retries_total": "counter",
+            "request_duration_seconds": "histogram",
+            "cache_hits_total": "counter",
+            "cache_misses_total": "counter",
+        }
+        samples = {name: [] for name in families}
+        for name, stats in data["requests"].items():
+            method, path = name.split(" ", 1)
+            labels = f'method="{method}",endpoint="{path}"'
+            for status, n in stats["status"].items():
+                samples["requests_total"].append(f'{{{labels},status="{status}"}} {n}')
+            samples["request_errors_total"].append(f"{{{labels}}} {stats['errors']}")
+            samples["request_retries_total"].append(f"{{{labels}}} {stats['retries']}")
+            histogram = samples["request_duration_seconds"]
+            for le, n in stats["latency"].items():
+                le = "+Inf" if le == float("inf") else repr(float(le))
+                histogram.append(f'_bucket{{{labels},le="{le}"}} {n}')
+            histogram.append(f"_sum{{{labels}}} {stats['seconds']}")
+            histogram.append(f"_count{{{labels}}} {stats['requests']}")
+        for path, counts in data["cache"].items():
+            labels = f'endpoint="{path}"'
+            samples["cache_hits_total"].append(f"{{{labels}}} {counts['hits']}")
+            samples["cache_misses_total"].append(f"{{{labels}}} {counts['misses']}")
+        lines = []
+        for name, type in families.items():
+            lines.append(f"# TYPE {prefix}_{name} {type}")
+            lines.extend(f"{prefix}_{name}{sample}" for sample in samples[name])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,271 @@
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import time
+from typing import Iterable, Iterator
+
+from .exceptions import HttpException, NotFoundHttpException
+from .models.main import Problem, User
+
+PROBLEM_LIST_SCHEMA = {
+    "code": None,
+    "currentData": {
+        "errorMessage": None,
+        "problems": {
+            "result": [
+                {
+                    "pid": None,
+                    "title": None,
+                    "type": None,
+                    "difficulty": None,
+                    "totalSubmit": None,
+                    "totalAccepted": None,
+                }
+            ],
+            "count": None,
+            "perPage": None,
+        },
+    },
+}
+
+
+class Mirror:
+    """题目和用户的本地 SQLite 镜像
+
+    镜像保存模型的 ``currentData``，查询时通过
+    :meth:`~luogu.models.Model.from_current_data` 构造模型，不发送请求。
+
+    .. code:: python
+
+        with luogu.Mirror("luogu.db") as mirror:
+            mirror.sync_problems()
+            p = mirror.problem("P1001")
+
+    题目的同步是增量的：逐页获取题目列表，仅重新获取新题目以及总提交数、
+    总通过数发生变化的题目。同步进度在每页完成后保存，中断后再次调用
+    :meth:`sync_problems` 将从中断的页继续。
+
+    :param str path: 数据库文件路径
+    :param session: 用于同步的会话，为 :data:`None` 时使用默认会话
+    :type session: Session | None
+    :param int max_workers: 同步时的最大线程数
+    """
+
+    PROBLEM_LIST_URL = "https://www.luogu.com.cn/problem/list"
+
+    def __init__(self, path: str, session=None, max_workers: int = 8) -> None:
+        self.Problem = Problem if session is None else session.Problem
+        self.User = User if session is None else session.User
+        self.max_workers = max_workers
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS models ("
+                "kind TEXT, id TEXT, data TEXT, updated REAL, PRIMARY KEY (kind, id))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS problems ("
+                "pid TEXT PRIMARY KEY, title TEXT, type TEXT, difficulty INTEGER, "
+                "total_submit INTEGER, total_accepted INTEGER)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                "name TEXT PRIMARY KEY, page INTEGER, started REAL)"
+            )
+
+    def _fetch(self, model: type, id: str) -> "dict[str] | None":
+        try:
+            return model._get(model._url.format(id), refresh=True)["currentData"]
+        except HttpException:
+            return None
+
+    def _store(self, kind: str, id: str, current_data: "dict[str]") -> None:
+        self._db.execute(
+            "REPLACE INTO models VALUES (?, ?, ?, ?)",
+            (kind, id, json.dumps(current_data, ensure_ascii=False), time()),
+        )
+
+    def sync_problems(self, type: "str | None" = None, full: bool = False) -> int:
+        """增量同步题目
+
+        :param type: 题目类型，如 ``"P"``，为 :data:`None` 时同步题目列表的默认类型
+        :type type: str | None
+        :param bool full: 值为真时重新获取所有题目，而不仅是发生变化的题目
+
+        :returns: 本次获取的题目数量
+        :rtype: int
+        """
+        name = f"problems:{type or ''}"
+        with self._lock:
+            row = self._db.execute(
+                "SELECT page FROM sync_state WHERE name = ?", (name,)
+            ).fetchone()
+        page = 1 if row is None else row[0]
+        if row is None:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT INTO sync_state VALUES (?, ?, ?)", (name, page, time())
+                )
+        fetched = 0
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            while True:
+                params = {"page": page}
+                if type is not None:
+                    params["type"] = type
+                problems = self.Problem._get(
+                    self.PROBLEM_LIST_URL, params, schema=PROBLEM_LIST_SCHEMA
+                )["currentData"]["problems"]
+                result = problems["result"]
+                changed = result if full else self._changed(result)
+                pids = [p["pid"] for p in changed]
+                data = list(
+                    executor.map(lambda pid: self._fetch(self.Problem, pid), pids)
+                )
+                pages = -(-problems["count"] // problems["perPage"])
+                page += 1
+                with self._lock, self._db:
+                    for p, current_data in zip(changed, data):
+                        if current_data is None:
+                            continue
+                        self._store("problem", p["pid"], current_data)
+                        self._db.execute(
+                            "REPLACE INTO problems VALUES (?, ?, ?, ?, ?, ?)",
+                            (
+                                p["pid"],
+                                p.get("title"),
+                                p.get("type"),
+                                p.get("difficulty"),
+                                p.get("totalSubmit"),
+                                p.get("totalAccepted"),
+                            ),
+                        )
+                        fetched += 1
+                    if not result or page > pages:
+                        self._db.execute(
+                            "DELETE FROM sync_state WHERE name = ?", (name,)
+                        )
+                        return fetched
+                    self._db.execute(
+                        "UPDATE sync_state SET page = ? WHERE name = ?", (page, name)
+                    )
+
+    def _changed(self, problems: "list[dict[str]]") -> "list[dict[str]]":
+        """题目列表中新增或总提交数、总通过数发生变化的题目"""
+        with self._lock:
+            known = dict(
+                (row[0], row[1:])
+                for row in self._db.execute(
+                    "SELECT pid, total_submit, total_accepted FROM problems "
+                    f"WHERE pid IN ({', '.join('?' * len(problems))})",
+                    [p["pid"] for p in problems],
+                )
+            )
+        return [
+            p
+            for p in problems
+            if known.get(p["pid"]) != (p.get("totalSubmit"), p.get("totalAccepted"))
+        ]
+
+    def sync_users(
+        self, uids: "Iterable[int | str]", max_age: "float | None" = None
+    ) -> int:
+        """同步用户
+
+        用户没有可用于检测变化的列表，因此逐个重新获取。
+
+        :param uids: 用户 ID
+        :type uids: Iterable[int | str]
+        :param max_age: 跳过在该时间（秒）内同步过的用户，为 :data:`None` 时不跳过
+        :type max_age: float | None
+
+        :returns: 本次获取的用户数量
+        :rtype: int
+        """
+        uids = [str(uid) for uid in uids]
+        if max_age is not None:
+            with self._lock:
+                fresh = {
+                    row[0]
+                    for row in self._db.execute(
+                        "SELECT id FROM models WHERE kind = 'user' AND updated > ?",
+                        (time() - max_age,),
+                    )
+                }
+            uids = [uid for uid in uids if uid not in fresh]
+        fetched = 0
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for uid, current_data in zip(
+                uids, executor.map(lambda uid: self._fetch(self.User, uid), uids)
+            ):
+                if current_data is None:
+                    continue
+                with self._lock, self._db:
+                    self._store("user", uid, current_data)
+                fetched += 1
+        return fetched
+
+    def _load(self, kind: str, id: str) -> "dict[str] | None":
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM models WHERE kind = ? AND id = ?", (kind, id)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def problem(self, pid: str) -> Problem:
+        """从镜像中获取题目
+
+        :param str pid: 题目 ID
+
+        :raises NotFoundHttpException: 镜像中没有该题目
+        """
+        current_data = self._load("problem", pid)
+        if current_data is None:
+            raise NotFoundHttpException(f"Problem {pid} is not mirrored")
+        return self.Problem.from_current_data(current_data)
+
+    def user(self, uid: "int | str") -> User:
+        """从镜像中获取用户
+
+        :param uid: 用户 ID
+        :type uid: int | str
+
+        :raises NotFoundHttpException: 镜像中没有该用户
+        """
+        current_data = self._load("user", str(uid))
+        if current_data is None:
+            raise NotFoundHttpException(f"User {uid} is not mirrored")
+        return self.User.from_current_data(current_data)
+
+    def problems(self) -> "Iterator[Problem]":
+        """镜像中的所有题目"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM models WHERE kind = 'problem' ORDER BY id"
+            ).fetchall()
+        for row in rows:
+            yield self.Problem.from_current_data(json.loads(row[0]))
+
+    def users(self) -> "Iterator[User]":
+        """镜像中的所有用户"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM models WHERE kind = 'user' ORDER BY id"
+            ).fetchall()
+        for row in rows:
+            yield self.User.from_current_data(json.loads(row[0]))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self._db.close()
+
+    def __enter__(self) -> "Mirror":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,53 +1,472 @@
+import json
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from hashlib import blake2b
+from itertools import islice
+from threading import Lock
+from typing import Iterable, Iterator
+from weakref import WeakValueDictionary
+
 import requests
 
-from ..constants import USER_AGENT
+from ..adapters import make_session
+from ..cache import Cache
 from ..exceptions import AccessDeniedHttpException, HttpException, NotFoundHttpException
-from ..utils import dict_without_underscores, get_csrf_token
+from ..metrics import Hooks
+from ..ratelimit import TokenBucket
+from ..utils import (
+    SingleFlight,
+    cached_property,
+    decode,
+    dict_without_underscores,
+    loads,
+    post_with_csrf_token,
+    project,
+)
+
+_MISSING = object()
+_CONTENT_ONLY = {"X-Luogu-Type": "content-only"}
+_public_models: "dict[str, type]" = {}
+
+
+def field(key: str, convert=None, default=_MISSING) -> cached_property:
+    """惰性解析的字段
+
+    首次访问时从 ``_current_data`` 中取出 *key* 对应的值，经 *convert* 转换后缓存。
+
+    :param str key: 字段在 ``_current_data[_section]`` 中的键
+    :param convert: 转换函数
+    :param default: 键不存在时的默认值，未指定时抛出 :class:`AttributeError`，
+        因此 :func:`hasattr` 和 :func:`getattr` 可用于判断字段是否存在
+    """
+
+    def get(self):
+        try:
+            value = self._data[key]
+        except KeyError as e:
+            if default is not _MISSING:
+                return default
+            raise AttributeError(
+                f"{self.__class__.__name__!r} object has no field {key!r}"
+            ) from e
+        return value if convert is None else convert(value)
+
+    prop = cached_property(get)
+    prop.key = key
+    prop.convert = convert
+    return prop
+
+
+def _flight_key(url: str, params: "dict | None", schema) -> "str | tuple":
+    # 裁剪方式不同的请求不能共享结果
+    key = Cache.key(url, params)
+    return key if schema is None else (key, id(schema))
+
 
+def _restore(model: type, current_data: "dict[str]") -> "Model":
+    return model.from_current_data(current_data)
 
-class Model:
-    _session = requests.Session()
-    _session.headers["User-Agent"] = USER_AGENT
+
+class ModelMeta(type):
+    """模型的元类
+
+    若模型类设置了 ``_identity_map``，则以同一 ID 构造模型时，
+    只要之前构造的实例仍然存活，就直接返回该实例而不再发送请求。
+    """
+
+    _lock = Lock()
+
+    def __call__(cls, *args, **kwargs):
+        if cls._identity_map is None or len(args) != 1 or kwargs:
+            return super().__call__(*args, **kwargs)
+        self = cls._lookup(args[0])
+        if self is None:
+            self = cls._remember(args[0], super().__call__(*args))
+        return self
+
+    def _lookup(cls, id: "int | str") -> "Model | None":
+        if cls._identity_map is None:
+            return None
+        with cls._lock:
+            return cls._identity_map.get((cls, str(id)))
+
+    def _remember(cls, id: "int | str", instance: "Model") -> "Model":
+        """记录 *instance*，返回最终记录的实例
+
+        并发构造同一 ID 的模型时，先记录的实例胜出，其余调用者应使用返回值。
+        """
+        if cls._identity_map is None:
+            return instance
+        keys = ((cls, str(id)), (cls, str(instance.id)))
+        with cls._lock:
+            for key in keys:
+                existing = cls._identity_map.get(key)
+                if existing is not None:
+                    instance = existing
+                    break
+            for key in keys:
+                cls._identity_map[key] = instance
+        return instance
+
+
+class Model(metaclass=ModelMeta):
+    _session = make_session()
+    _client = None
+    _cache: "Cache | None" = None
+    _hooks: "Hooks | None" = None
+    _flights = SingleFlight()
+    _identity_map: "WeakValueDictionary | None" = WeakValueDictionary()
+    _models: "dict[type, type]" = {}
+    _url: str
+    _section: str
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if cls.__module__.startswith(__name__):
+            _public_models[cls.__qualname__] = cls
 
     @classmethod
-    def _get(cls, url: str, params: dict = None, check: bool = True) -> "dict[str]":
-        r = cls._session.get(
-            url,
-            params=params,
-            headers={"X-Luogu-Type": "content-only"},
-        )
-        r.raise_for_status()
-        data = r.json()
+    def _public_model(cls) -> type:
+        """与会话绑定的模型对应的公开模型，如会话的 ``User`` 对应 :class:`User`"""
+        for model in cls.__mro__:
+            if _public_models.get(model.__qualname__) is model:
+                return model
+        return cls
+
+    @staticmethod
+    def _check(data: "dict[str]") -> None:
+        if data["code"] == 404:
+            raise NotFoundHttpException(data["currentData"]["errorMessage"])
+        elif data["code"] == 403:
+            raise AccessDeniedHttpException(data["currentData"]["errorMessage"])
+        elif data["code"] >= 400:
+            raise HttpException(data["currentData"]["errorMessage"])
+
+    @classmethod
+    def _sync_session(cls) -> "requests.Session":
+        if cls._session is None:
+            raise RuntimeError(
+                f"{cls.__name__} is bound to an AsyncSession, "
+                f"use 'await {cls.__name__}.fetch()' instead"
+            )
+        return cls._session
+
+    @classmethod
+    def _get(
+        cls,
+        url: str,
+        params: dict = None,
+        check: bool = True,
+        refresh: bool = False,
+        schema: "dict[str] | None" = None,
+    ) -> "dict[str]":
+        # 指定 schema 时仅检查裁剪后的数据，schema 应保留 code 和 currentData.errorMessage
+        cache = cls._cache
+        data = None
+        headers = dict(_CONTENT_ONLY)
+        if cache is not None:
+            key = cache.key(url, params)
+            if not refresh:
+                data, validators = cache.lookup(key)
+                headers.update(validators)
+                if cls._hooks is not None:
+                    cls._hooks.emit("cache", url, data is not None)
+        if data is None:
+
+            def get():
+                session = cls._sync_session()
+                r = session.get(url, params=params, headers=headers)
+                r.raise_for_status()
+                if cache is None:
+                    return decode(r.content, schema)
+                data = cache.update(key, r)
+                if data is None:
+                    # 缓存在条件请求期间被淘汰，不带条件请求头重新请求
+                    r = session.get(url, params=params, headers=_CONTENT_ONLY)
+                    r.raise_for_status()
+                    data = cache.update(key, r)
+                return project(data, schema)
+
+            data = cls._flights.do(_flight_key(url, params, schema), get)
+        else:
+            data = project(data, schema)
         if check:
-            if data["code"] == 404:
-                raise NotFoundHttpException(data["currentData"]["errorMessage"])
-            elif data["code"] == 403:
-                raise AccessDeniedHttpException(data["currentData"]["errorMessage"])
-            elif data["code"] >= 400:
-                raise HttpException(data["currentData"]["errorMessage"])
+            cls._check(data)
         return data
 
     @classmethod
-    def _post(cls, url: str, data: dict = None) -> "dict[str]":
-        r = cls._session.post(
-            url,
-            json=data,
-            headers={
-                "x-csrf-token": get_csrf_token(cls._session),
-            },
+    async def _aget(
+        cls,
+        url: str,
+        params: dict = None,
+        check: bool = True,
+        schema: "dict[str] | None" = None,
+        refresh: bool = False,
+    ) -> "dict[str]":
+        if cls._client is None:
+            raise RuntimeError(f"{cls.__name__} is not bound to an AsyncSession")
+        cache = cls._cache
+        data = None
+        headers = dict(_CONTENT_ONLY)
+        if cache is not None:
+            key = cache.key(url, params)
+            if not refresh:
+                data, validators = cache.lookup(key)
+                headers.update(validators)
+                if cls._hooks is not None:
+                    cls._hooks.emit("cache", url, data is not None)
+        if data is None:
+
+            async def get():
+                r = await cls._client.get(url, params=params, headers=headers)
+                r.raise_for_status()
+                if cache is None:
+                    return decode(r.content, schema)
+                data = cache.update(key, r)
+                if data is None:
+                    # 缓存在条件请求期间被淘汰，不带条件请求头重新请求
+                    r = await cls._client.get(url, params=params, headers=_CONTENT_ONLY)
+                    r.raise_for_status()
+                    data = cache.update(key, r)
+                return project(data, schema)
+
+            data = await cls._flights.do_async(_flight_key(url, params, schema), get)
+        else:
+            data = project(data, schema)
+        if check:
+            cls._check(data)
+        return data
+
+    @classmethod
+    async def fetch(cls, id: "int | str", refresh: bool = False) -> "Model":
+        """异步获取模型，仅可用于 :class:`AsyncSession` 中的模型
+
+        :param id: 模型 ID
+        :type id: int | str
+        :param bool refresh: 值为真时忽略标识映射和缓存重新获取，
+            仍存活的实例将就地更新，同 :meth:`refresh`
+
+        .. code:: python
+
+            async with luogu.AsyncSession() as s:
+                u = await s.User.fetch(1)
+                u = await s.User.fetch(1, refresh=True)
+        """
+        if not refresh:
+            self = cls._lookup(id)
+            if self is not None:
+                return self
+        current_data = (await cls._aget(cls._url.format(id), refresh=refresh))[
+            "currentData"
+        ]
+        self = cls._remember(id, cls.from_current_data(current_data))
+        if refresh and self._current_data is not current_data:
+            self.__dict__.clear()
+            self._load(current_data)
+        return self
+
+    @classmethod
+    def from_current_data(cls, current_data: "dict[str]") -> "Model":
+        """从已获取的 ``currentData`` 构造模型，不发送请求
+
+        字段在首次访问时才会被解析。
+
+        :param current_data: 响应中的 ``currentData``
+        :type current_data: dict[str]
+        """
+        self = cls.__new__(cls)
+        self._load(current_data)
+        return self
+
+    @classmethod
+    def from_dict(cls, data: "dict[str]") -> "Model":
+        """从 :meth:`to_dict` 导出的字典构造模型，不发送请求
+
+        :param data: :meth:`to_dict` 导出的字典
+        :type data: dict[str]
+        """
+        return cls.from_current_data(data)
+
+    def to_dict(self) -> "dict[str]":
+        """导出为可 JSON 序列化的字典，即模型的 ``currentData``
+
+        :rtype: dict[str]
+        """
+        return dict(self._current_data)
+
+    def __reduce_ex__(self, protocol):
+        # 仅序列化 currentData，反序列化后的模型使用默认会话
+        if not hasattr(self, "_current_data"):
+            return super().__reduce_ex__(protocol)
+        return _restore, (self._public_model(), self._current_data)
+
+    @staticmethod
+    def dump_many(models: "Iterable[Model]") -> bytes:
+        """将多个模型导出为压缩的二进制数据
+
+        数据为 zlib 压缩的 JSON，仅包含模型的类型和 ``currentData``，
+        可使用 :meth:`load_many` 导入。
+
+        :param models: 模型
+        :type models: Iterable[Model]
+
+        :rtype: bytes
+        """
+        return zlib.compress(
+            json.dumps(
+                [
+                    [model._public_model().__qualname__, model._current_data]
+                    for model in models
+                ],
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode()
         )
+
+    @classmethod
+    def load_many(cls, data: bytes) -> "list[Model]":
+        """导入 :meth:`dump_many` 导出的模型，不发送请求
+
+        通过会话中的模型（如 ``session.User.load_many``）调用时，导入的模型将绑定该会话。
+
+        :param bytes data: :meth:`dump_many` 导出的数据
+
+        :rtype: list[Model]
+        """
+        return [
+            cls._model(_public_models[name]).from_current_data(current_data)
+            for name, current_data in loads(zlib.decompress(data))
+        ]
+
+    def _load(self, current_data: "dict[str]") -> None:
+        self._current_data: dict[str] = current_data
+
+    def refresh(self) -> "Model":
+        """重新获取数据，已解析的字段和关联的模型将在下次访问时重新解析"""
+        current_data = self._get(self._url.format(self.id), refresh=True)["currentData"]
+        self.__dict__.clear()
+        self._load(current_data)
+        return self
+
+    @classmethod
+    def _model(cls, model: type) -> type:
+        """返回与该模型绑定同一会话的 *model*"""
+        return cls._models.get(model, model)
+
+    @property
+    def _data(self) -> "dict[str]":
+        return self._current_data[self._section]
+
+    @classmethod
+    def fetch_many(
+        cls,
+        ids: "Iterable[int | str]",
+        max_workers: int = 8,
+        rate: "float | None" = None,
+        ordered: bool = True,
+    ) -> "Iterator[tuple[int | str, Model | HttpException]]":
+        """批量获取模型
+
+        使用线程池并发请求，所有线程共用同一个会话。单个模型请求失败时抛出的
+        :class:`HttpException` 不会中断整批请求，而是作为结果返回。
+
+        .. code:: python
+
+            for pid, problem in luogu.Problem.fetch_many(pids, rate=10):
+                if isinstance(problem, luogu.HttpException):
+                    continue
+                ...
+
+        :param ids: 模型 ID
+        :type ids: Iterable[int | str]
+        :param int max_workers: 最大线程数
+        :param rate: 每秒最多发起的请求数，为 :data:`None` 时不限制
+        :type rate: float | None
+        :param bool ordered: 值为真时按输入顺序返回结果；否则按完成顺序返回
+
+        *ids* 按需读取，同时最多有 ``2 * max_workers`` 个请求正在进行或等待返回，
+        已返回的结果不再被引用，因此可用于逐个处理大量模型。
+
+        :returns: ``(ID, 模型或异常)``
+        :rtype: Iterator[tuple[int | str, Model | HttpException]]
+        """
+        rate_limiter = TokenBucket(rate) if rate else None
+
+        def fetch(id):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                return cls(id)
+            except HttpException as e:
+                return e
+
+        ids = iter(ids)
+        window = 2 * max_workers
+        with ThreadPoolExecutor(max_workers) as executor:
+            # 按提交顺序保存正在进行的请求
+            futures: "dict[Future, int | str]" = {}
+
+            def submit() -> None:
+                for id in islice(ids, window - len(futures)):
+                    futures[executor.submit(fetch, id)] = id
+
+            try:
+                submit()
+                while futures:
+                    if ordered:
+                        future = next(iter(futures))
+                    else:
+                        future = next(
+                            iter(wait(futures, return_when=FIRST_COMPLETED)[0])
+                        )
+                    id = futures.pop(future)
+                    result = future.result()
+                    submit()
+                    yield id, result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    @classmethod
+    def _post(cls, url: str, data: dict = None) -> "dict[str]":
+        r = post_with_csrf_token(cls._sync_session(), url, data)
         r.raise_for_status()
         return r.json()
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.id})"
 
+    @cached_property
+    def fingerprint(self) -> str:
+        """内容指纹，即 ``currentData`` 规范化 JSON 的 BLAKE2b 摘要，首次访问时计算
+
+        :rtype: str
+        """
+        return blake2b(
+            json.dumps(
+                self._current_data,
+                ensure_ascii=False,
+                sort_keys=True,
+                separators=(",", ":"),
+            ).encode(),
+            digest_size=16,
+        ).hexdigest()
+
     def __eq__(self, other):
         if hasattr(self, "_current_data") and hasattr(other, "_current_data"):
-            return self._current_data == other._current_data
+            return (
+                self._public_model() is other._public_model()
+                and self.fingerprint == other.fingerprint
+            )
         if type(other) is type(self):
             return dict_without_underscores(self.__dict__) == dict_without_underscores(
                 other.__dict__
             )
-        else:
-            super().__eq__(other)
+        return NotImplemented
+
+    def __hash__(self):
+        if hasattr(self, "_current_data"):
+            return hash((self._public_model(), str(self.id)))
+        return hash(
+            (type(self), tuple(sorted(dict_without_underscores(self.__dict__).items())))
+        )
@@ -1,7 +1,32 @@
+from array import array
+from collections.abc import Sequence
 from datetime import datetime
+from sys import intern
+from typing import Iterable, Iterator
 
-from ..utils import LazyList, cached_method
-from . import Model
+from ..columns import Columnar
+from ..utils import LazyList, cached_property
+from . import Model, field
+
+
+def _or_missing(value: "int | None") -> int:
+    return -1 if value is None else value
+
+
+def _getstate(self) -> "dict[str]":
+    # 与会话绑定的模型无法序列化，反序列化后使用公开模型，即默认会话
+    state = {name: getattr(self, name) for name in self.__slots__}
+    state["_model"] = self._model._public_model()
+    return state
+
+
+def _setstate(self, state: "dict[str]") -> None:
+    for name, value in state.items():
+        setattr(self, name, value)
+
+
+def _missing_to_none(value: int) -> "int | None":
+    return None if value == -1 else value
 
 
 class User(Model):
@@ -39,6 +64,8 @@ class User(Model):
     :vartype passed_problems: list[Problem] | None
     :var submitted_problems: 尝试过的题目
     :vartype submitted_problems: list[Problem] | None
+    :var Problem.SummaryList passed_problem_summaries: 已通过的题目摘要
+    :var Problem.SummaryList submitted_problem_summaries: 尝试过的题目摘要
     """
 
     class Prize(Model):
@@ -54,59 +81,117 @@ class User(Model):
             self.contest_name = contestName
             self.prize = prize
 
-    def __init__(self, uid: "int | str") -> None:
-        self._current_data: dict[str] = self._get(
-            f"https://www.luogu.com.cn/user/{uid}"
-        )["currentData"]
-
-        user: dict[str] = self._current_data["user"]
-        self.register_time = datetime.fromtimestamp(user["registerTime"])
-        self.introduction: str = user["introduction"]
-        self.prize = [self.Prize(**prize) for prize in user["prize"]]
-        self.blog_address: str = user["blogAddress"]
-        self.passed_problem_count: int | None = user["passedProblemCount"]
-        self.submitted_problem_count: int | None = user["submittedProblemCount"]
-        self.uid: int = user["uid"]
-        self.name: str = user["name"]
-        self.slogan: str = user["slogan"]
-        self.badge: str | None = user["badge"]
-        self.is_admin: bool = user["isAdmin"]
-        self.is_banned: bool = user["isBanned"]
-        self.color: str = user["color"]
-        self.ccf_level: int = user["ccfLevel"]
-        self.following_count: int = user["followingCount"]
-        self.follower_count: int = user["followerCount"]
-        self.ranking: int = user["ranking"]
-        self.background: str = user["background"]
-        self.is_root: bool = user["isRoot"] if "isRoot" in user else None
-
-        self._passed_problems: list[dict] = (
-            self._current_data["passedProblems"]
-            if "passedProblems" in self._current_data
-            else None
+    class Summary:
+        """搜索结果等列表中的用户摘要，可使用 :meth:`resolve` 获取完整的用户
+
+        :var int uid: 用户 ID
+        :var str name: 用户名
+        :var str slogan: 个性签名
+        :var badge: 徽章
+        :vartype badge: str | None
+        :var bool is_admin: 是否管理员
+        :var bool is_banned: 是否被封禁
+        :var str color: 颜色
+        :var int ccf_level: CCF 等级
+        :var str background: 封面
+        """
+
+        __slots__ = (
+            "_model",
+            "uid",
+            "name",
+            "slogan",
+            "badge",
+            "is_admin",
+            "is_banned",
+            "color",
+            "ccf_level",
+            "background",
         )
-        self.passed_problems: list[Problem] = (
-            LazyList(
-                Problem,
-                [p["pid"] for p in self._passed_problems],
-            )
+
+        def __init__(self, model: type, data: "dict[str]") -> None:
+            self._model = model
+            self.uid: int = data["uid"]
+            self.name: str = data.get("name")
+            self.slogan: str = data.get("slogan")
+            self.badge: "str | None" = data.get("badge")
+            self.is_admin: bool = data.get("isAdmin")
+            self.is_banned: bool = data.get("isBanned")
+            self.color: str = data.get("color")
+            self.ccf_level: int = data.get("ccfLevel")
+            self.background: str = data.get("background")
+
+        def resolve(self) -> "User":
+            """获取完整的用户"""
+            return self._model(self.uid)
+
+        def __repr__(self):
+            return f"{self._model.__name__}.Summary({self.uid})"
+
+        __getstate__ = _getstate
+        __setstate__ = _setstate
+
+    _url = "https://www.luogu.com.cn/user/{}"
+    _section = "user"
+
+    def __init__(self, uid: "int | str") -> None:
+        self._load(self._get(self._url.format(uid))["currentData"])
+
+    register_time = field("registerTime", datetime.fromtimestamp)
+    introduction: str = field("introduction")
+    blog_address: str = field("blogAddress")
+    passed_problem_count: "int | None" = field("passedProblemCount")
+    submitted_problem_count: "int | None" = field("submittedProblemCount")
+    uid: int = field("uid")
+    name: str = field("name")
+    slogan: str = field("slogan")
+    badge: "str | None" = field("badge")
+    is_admin: bool = field("isAdmin")
+    is_banned: bool = field("isBanned")
+    color: str = field("color")
+    ccf_level: int = field("ccfLevel")
+    following_count: int = field("followingCount")
+    follower_count: int = field("followerCount")
+    ranking: int = field("ranking")
+    background: str = field("background")
+    is_root: "bool | None" = field("isRoot", default=None)
+
+    @cached_property
+    def prize(self) -> "list[Prize]":
+        return [self.Prize(**prize) for prize in self._data["prize"]]
+
+    @cached_property
+    def _passed_problems(self) -> "list[dict] | None":
+        return self._current_data.get("passedProblems")
+
+    @cached_property
+    def passed_problems(self) -> "list[Problem]":
+        return (
+            LazyList(self._model(Problem), [p["pid"] for p in self._passed_problems])
             if self._passed_problems
             else []
         )
-        self._submitted_problems: list[dict] = (
-            self._current_data["submittedProblems"]
-            if "submittedProblems" in self._current_data
-            else None
-        )
-        self.submitted_problems: list[Problem] = (
-            LazyList(
-                Problem,
-                [p["pid"] for p in self._submitted_problems],
-            )
+
+    @cached_property
+    def _submitted_problems(self) -> "list[dict] | None":
+        return self._current_data.get("submittedProblems")
+
+    @cached_property
+    def submitted_problems(self) -> "list[Problem]":
+        return (
+            LazyList(self._model(Problem), [p["pid"] for p in self._submitted_problems])
             if self._submitted_problems
             else []
         )
 
+    @cached_property
+    def passed_problem_summaries(self) -> "Problem.SummaryList":
+        return Problem.SummaryList(self._model(Problem), self._passed_problems or ())
+
+    @cached_property
+    def submitted_problem_summaries(self) -> "Problem.SummaryList":
+        return Problem.SummaryList(self._model(Problem), self._submitted_problems or ())
+
     @property
     def id(self):
         return self.uid
@@ -117,12 +202,33 @@ class User(Model):
 
         :param str keyword: 搜索关键字
         """
+        return LazyList(cls._model(User), [u.uid for u in cls.search_iter(keyword)])
+
+    @classmethod
+    def search_iter(cls, keyword: str) -> "Iterator[User.Summary]":
+        """根据 UID 或用户名搜索用户，逐个返回搜索结果中的用户摘要
+
+        首次迭代时才发送请求，用户摘要直接由搜索结果构造，不会逐个获取用户。
+
+        .. code:: python
+
+            summary = next(luogu.User.search_iter("kkksc03"), None)
+            if summary is not None:
+                user = summary.resolve()
+
+        :param str keyword: 搜索关键字
+
+        :rtype: Iterator[User.Summary]
+        """
+        model = cls._model(User)
         users = cls._get(
             "https://www.luogu.com.cn/api/user/search",
             {"keyword": keyword},
             False,
         )["users"]
-        return LazyList(User, [u["uid"] for u in users if u is not None])
+        for u in users:
+            if u is not None:
+                yield cls.Summary(model, u)
 
 
 class Problem(Model):
@@ -158,35 +264,40 @@ class Problem(Model):
     :var str type: 题目类型
     """
 
+    _url = "https://www.luogu.com.cn/problem/{}"
+    _section = "problem"
+
     def __init__(self, pid: str) -> None:
-        self._current_data: dict[str] = self._get(
-            f"https://www.luogu.com.cn/problem/{pid}"
-        )["currentData"]
-
-        problem: dict[str] = self._current_data["problem"]
-        self.background: str = problem["background"]
-        self.description: str = problem["description"]
-        self.input_format: str = problem["inputFormat"]
-        self.output_format: str = problem["outputFormat"]
-        self.samples: list[tuple[str, str]] = [(s[0], s[1]) for s in problem["samples"]]
-        self.hint: str = problem["hint"]
-        self._provider: str = problem["provider"]
-        self.attachments = [
-            self.Attachment(**attachment) for attachment in problem["attachments"]
+        self._load(self._get(self._url.format(pid))["currentData"])
+
+    background: str = field("background")
+    description: str = field("description")
+    input_format: str = field("inputFormat")
+    output_format: str = field("outputFormat")
+    samples: "list[tuple[str, str]]" = field(
+        "samples", lambda samples: [(s[0], s[1]) for s in samples]
+    )
+    hint: str = field("hint")
+    _provider: "dict[str]" = field("provider")
+    can_edit: bool = field("canEdit")
+    limits: "dict[str, list[int]]" = field("limits")
+    std_code: str = field("stdCode")
+    tags: "list[int]" = field("tags")
+    wants_translation: bool = field("wantsTranslation")
+    total_submit: int = field("totalSubmit")
+    total_accepted: int = field("totalAccepted")
+    flag: int = field("flag")
+    pid: str = field("pid")
+    title: str = field("title")
+    difficulty: int = field("difficulty")
+    full_score: int = field("fullScore")
+    type: str = field("type")
+
+    @cached_property
+    def attachments(self) -> "list[Attachment]":
+        return [
+            self.Attachment(**attachment) for attachment in self._data["attachments"]
         ]
-        self.can_edit: bool = problem["canEdit"]
-        self.limits: dict[str, list[int]] = problem["limits"]
-        self.std_code: str = problem["stdCode"]
-        self.tags: list[int] = problem["tags"]
-        self.wants_translation: bool = problem["wantsTranslation"]
-        self.total_submit: int = problem["totalSubmit"]
-        self.total_accepted: int = problem["totalAccepted"]
-        self.flag: int = problem["flag"]
-        self.pid: str = problem["pid"]
-        self.title: str = problem["title"]
-        self.difficulty: int = problem["difficulty"]
-        self.full_score: int = problem["fullScore"]
-        self.type: str = problem["type"]
 
     class Attachment(Model):
         """附件
@@ -212,11 +323,133 @@ class Problem(Model):
             self.id = id
             self.filename = filename
 
+    class Summary:
+        """题目列表中的题目摘要，可使用 :meth:`resolve` 获取完整的题目
+
+        :var str pid: 题目 ID
+        :var str title: 题目标题
+        :var int difficulty: 难度
+        :var int full_score: 满分
+        :var str type: 题目类型
+        """
+
+        __slots__ = ("_model", "pid", "title", "difficulty", "full_score", "type")
+
+        def __init__(
+            self,
+            model: type,
+            pid: str,
+            title: str,
+            difficulty: int,
+            full_score: int,
+            type: str,
+        ) -> None:
+            self._model = model
+            self.pid = pid
+            self.title = title
+            self.difficulty = difficulty
+            self.full_score = full_score
+            self.type = type
+
+        def resolve(self) -> "Problem":
+            """获取完整的题目"""
+            return self._model(self.pid)
+
+        def __repr__(self):
+            return f"{self._model.__name__}.Summary({self.pid})"
+
+        __getstate__ = _getstate
+        __setstate__ = _setstate
+
+    class SummaryList(Sequence, Columnar):
+        """按列存储的题目摘要列表
+
+        数值字段存储在 :class:`array.array` 中，题目类型等重复的字符串被驻留，
+        元素在访问时才构造为 :class:`Problem.Summary`。
+        缺失的数值字段存储为 ``-1``，访问时还原为 :data:`None`。
+
+        :param model: 题目模型
+        :param problems: 用户数据中的题目，如 ``passedProblems``
+        :type problems: Iterable[dict[str]]
+
+        :var list[str] pids: 题目 ID
+        """
+
+        def __init__(self, model: type, problems: "Iterable[dict[str]]") -> None:
+            self._model = model
+            self.pids: "list[str]" = []
+            self._titles: "list[str]" = []
+            self._types: "list[str]" = []
+            self._difficulties = array("b")
+            self._full_scores = array("l")
+            for p in problems:
+                self.pids.append(p["pid"])
+                self._titles.append(p.get("title"))
+                self._types.append(p.get("type") and intern(p["type"]))
+                self._difficulties.append(_or_missing(p.get("difficulty")))
+                self._full_scores.append(_or_missing(p.get("fullScore")))
+
+        def __len__(self) -> int:
+            return len(self.pids)
+
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                result = self.__class__(self._model, ())
+                result.pids = self.pids[index]
+                result._titles = self._titles[index]
+                result._types = self._types[index]
+                result._difficulties = self._difficulties[index]
+                result._full_scores = self._full_scores[index]
+                return result
+            return Problem.Summary(
+                self._model,
+                self.pids[index],
+                self._titles[index],
+                _missing_to_none(self._difficulties[index]),
+                _missing_to_none(self._full_scores[index]),
+                self._types[index],
+            )
+
+        def resolve(self, window: int = 0) -> "LazyList":
+            """获取完整的题目
+
+            :param int window: 迭代时提前并发获取的题目数量
+
+            :rtype: LazyList
+            """
+            return LazyList(self._model, self.pids, window)
+
+        def _columns(
+            self, fields: "Iterable[str] | None"
+        ) -> "tuple[dict[str, list], set[str]]":
+            columns = {
+                "pid": self.pids,
+                "title": self._titles,
+                "type": self._types,
+                "difficulty": self._difficulties,
+                "full_score": self._full_scores,
+            }
+            if fields is None:
+                fields = columns
+            return {
+                name: (
+                    list(map(_missing_to_none, columns[name]))
+                    if isinstance(columns[name], array)
+                    else list(columns[name])
+                )
+                for name in fields
+            }, set()
+
+        def __getstate__(self) -> "dict[str]":
+            return {**self.__dict__, "_model": self._model._public_model()}
+
+        def __repr__(self):
+            return f"{self.__class__.__qualname__}({self.pids!r})"
+
     @property
     def id(self):
         return self.pid
 
-    @property
-    @cached_method
+    @cached_property
     def provider(self):
-        return User(self._provider["uid"])
+        return self._model(User)(self._provider["uid"])
@@ -1,7 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from time import time
+from typing import Iterable, Iterator
 
-from ..utils import cached_method
-from . import Model
+import requests
+
+from ..exceptions import HttpException
+from ..ratelimit import TokenBucket
+from ..utils import cached_property, csrf_tokens
+from . import Model, field
 from .main import User
 
 
@@ -17,22 +24,21 @@ class Paste(Model):
     :var bool public: 是否公开
     """
 
+    _url = "https://www.luogu.com.cn/paste/{}"
+    _section = "paste"
+
     def __init__(self, id: str) -> None:
-        self._current_data: dict[str] = self._get(
-            f"https://www.luogu.com.cn/paste/{id}"
-        )["currentData"]
-
-        paste: dict[str] = self._current_data["paste"]
-        self.data: str = paste["data"]
-        self.id: str = paste["id"]
-        self._user: dict[str] = paste["user"]
-        self.time = datetime.fromtimestamp(paste["time"])
-        self.public: bool = paste["public"]
-
-    @property
-    @cached_method
+        self._load(self._get(self._url.format(id))["currentData"])
+
+    data: str = field("data")
+    id: str = field("id")
+    _user: "dict[str]" = field("user")
+    time = field("time", datetime.fromtimestamp)
+    public: bool = field("public")
+
+    @cached_property
     def user(self) -> User:
-        return User(self._user["uid"])
+        return self._model(User)(self._user["uid"])
 
     def delete(self) -> str:
         """删除剪贴板
@@ -42,11 +48,12 @@ class Paste(Model):
         """
         return self._post(f"https://www.luogu.com.cn/paste/delete/{self.id}")["id"]
 
-    def edit(self, data: str = None, public: bool = None):
+    def edit(self, data: str = None, public: bool = None, refresh: bool = False):
         """编辑剪贴板
 
         :param str data: 剪贴板内容
         :param bool public: 是否公开
+        :param bool refresh: 值为真时重新获取剪贴板；否则直接更新已获取的数据
 
         :returns: 剪贴板 ID
         :rtype: str
@@ -55,23 +62,96 @@ class Paste(Model):
             f"https://www.luogu.com.cn/paste/edit/{self.id}",
             {"data": data, "public": public},
         )
+        if refresh:
+            self.refresh()
+            return r["id"]
+        paste = dict(self._current_data["paste"])
         if data is not None:
-            self.data = data
+            paste["data"] = self.data = data
         if public is not None:
-            self.public = public
+            paste["public"] = self.public = public
+        self._current_data = {**self._current_data, "paste": paste}
+        self.__dict__.pop("fingerprint", None)
         return r["id"]
 
     @classmethod
-    def new(cls, data: str, public: bool = None) -> "Paste":
+    def _created(cls, id: str, data: str, public: "bool | None") -> "Paste":
+        """由新建时的参数构造剪贴板，Cookies 中没有用户 ID 时重新获取"""
+        uid = cls._sync_session().cookies.get("_uid")
+        if uid is None:
+            return cls(id)
+        self = cls.from_current_data(
+            {
+                "paste": {
+                    "data": data,
+                    "id": id,
+                    "user": {"uid": int(uid)},
+                    "time": int(time()),
+                    "public": bool(public),
+                }
+            }
+        )
+        return cls._remember(id, self)
+
+    @classmethod
+    def new(cls, data: str, public: bool = None, refresh: bool = False) -> "Paste":
         """新建剪贴板
 
+        剪贴板由响应中的 ID 和新建时的参数构造，不会再次请求。
+
         :param str data: 剪贴板内容
         :param bool public: 值为真时表示公开剪贴板，否则表示私有剪贴板
+        :param bool refresh: 值为真时重新获取剪贴板，以得到完整的用户信息和服务器时间
 
-        :rtype: Session.Paste
+        :rtype: Paste
         """
         r = cls._post(
             "https://www.luogu.com.cn/paste/new",
             {"data": data, "public": public},
         )
-        return cls(r["id"])
+        if refresh:
+            return cls(r["id"])
+        return cls._created(r["id"], data, public)
+
+    @classmethod
+    def new_many(
+        cls,
+        data: "Iterable[str]",
+        public: bool = None,
+        max_workers: int = 8,
+        rate: "float | None" = None,
+    ) -> "Iterator[Paste | Exception]":
+        """批量新建剪贴板
+
+        使用线程池并发请求，所有线程共用同一个会话的连接池和 CSRF 令牌。
+        单个剪贴板新建失败时抛出的异常不会中断整批请求，而是作为结果返回。
+
+        :param data: 剪贴板内容
+        :type data: Iterable[str]
+        :param bool public: 值为真时表示公开剪贴板，否则表示私有剪贴板
+        :param int max_workers: 最大线程数
+        :param rate: 每秒最多发起的请求数，为 :data:`None` 时不限制
+        :type rate: float | None
+
+        :returns: 按输入顺序返回剪贴板或异常
+        :rtype: Iterator[Paste | HttpException | requests.HTTPError]
+        """
+        rate_limiter = TokenBucket(rate) if rate else None
+        csrf_tokens.get(cls._sync_session())
+
+        def new(data):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                return cls.new(data, public)
+            except (HttpException, requests.HTTPError) as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(new, d) for d in data]
+            try:
+                for future in futures:
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
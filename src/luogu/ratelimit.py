@@ -0,0 +1,115 @@
+import asyncio
+from email.utils import parsedate_to_datetime
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep, time
+
+
+class TokenBucket:
+    """令牌桶限流器
+
+    线程安全，也可在协程中使用，因此可以在多个线程、多个会话以及
+    :class:`~luogu.AsyncSession` 之间共享同一个限流器。
+
+    :param float rate: 每秒产生的令牌数，即平均每秒最多发送的请求数
+    :param int burst: 桶容量，即最多可连续发送的请求数
+    :param bool adaptive: 值为真时，收到 429 响应后速率减半，
+        之后每次成功的请求逐步恢复至 *rate*
+
+    :var float rate: 当前速率
+    """
+
+    def __init__(self, rate: float, burst: int = 1, adaptive: bool = False) -> None:
+        self.max_rate = self.rate = rate
+        self.burst = burst
+        self.adaptive = adaptive
+        self._tokens = float(burst)
+        self._time = monotonic()
+        self._lock = Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._time) * self.rate
+            )
+            self._time = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def acquire(self) -> None:
+        """阻塞直至获得一个令牌"""
+        delay = self._reserve()
+        if delay:
+            sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """等待直至获得一个令牌"""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def feedback(self, status_code: int) -> None:
+        """根据响应状态码调整速率，仅在 *adaptive* 为真时生效"""
+        if not self.adaptive:
+            return
+        with self._lock:
+            if status_code == 429:
+                self.rate = max(self.max_rate / 64, self.rate / 2)
+            elif status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+
+
+class Backoff:
+    """带随机抖动的指数退避
+
+    第 *n* 次重试前等待 ``[0, min(max_delay, factor * 2 ** n))`` 内的随机时间；
+    若响应带有 ``Retry-After`` 头，则按其等待，超过 *max_delay* 时不再重试，
+    直接返回该响应。
+    为避免重复写入，POST 请求仅在 429 时重试。
+
+    :param int retries: 最大重试次数
+    :param float factor: 退避系数（秒）
+    :param float max_delay: 最大等待时间（秒）
+    :param statuses: 需要重试的状态码
+    :type statuses: tuple[int, ...]
+    """
+
+    def __init__(
+        self,
+        retries: int = 3,
+        factor: float = 0.5,
+        max_delay: float = 30,
+        statuses: "tuple[int, ...]" = (429, 500, 502, 503, 504),
+    ) -> None:
+        self.retries = retries
+        self.factor = factor
+        self.max_delay = max_delay
+        self.statuses = statuses
+
+    def should_retry(self, method: str, status_code: int, attempt: int) -> bool:
+        return (
+            attempt < self.retries
+            and status_code in self.statuses
+            and (status_code == 429 or method != "POST")
+        )
+
+    def delay(self, attempt: int, headers) -> "float | None":
+        """重试前等待的时间（秒），``Retry-After`` 超过 *max_delay* 时为 :data:`None`"""
+        retry_after = self._retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return uniform(0, min(self.max_delay, self.factor * 2**attempt))
+
+    @staticmethod
+    def _retry_after(value: "str | None") -> "float | None":
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+        except (TypeError, ValueError):
+            return None
@@ -1,12 +1,51 @@
+import json
+import os
+from contextlib import contextmanager
 from http.cookies import SimpleCookie
+from importlib.util import find_spec
 from io import BytesIO
+from queue import Empty, Queue
+from threading import Lock
+from time import time
+from typing import Iterable, Iterator
+from weakref import WeakValueDictionary
 
 import requests
 
+from .adapters import AsyncLuoguTransport, make_session
+from .cache import Cache
 from .constants import USER_AGENT
+from .metrics import Hooks, Metrics
+from .models import Model
 from .models.main import Problem, User
 from .models.paste import Paste
-from .utils import get_csrf_token
+from .ratelimit import Backoff, TokenBucket
+from .utils import SingleFlight, csrf_tokens, post_with_csrf_token
+
+
+def _bind(session, **attrs) -> "dict[type, type]":
+    """为会话创建模型的子类，子类的类属性 *attrs* 指向该会话的连接池、缓存等
+
+    每个会话的模型都是不同的类，因此多个会话可以在不同线程中同时使用。
+
+    :returns: 公开模型到绑定了会话的模型的映射
+    """
+    models = {}
+    flights = SingleFlight()
+    for model in (Paste, Problem, User):
+        models[model] = type(
+            model.__name__,
+            (model,),
+            {
+                "__module__": __name__,
+                "__qualname__": f"{session.__class__.__name__}.{model.__name__}",
+                "_identity_map": session.identity_map,
+                "_models": models,
+                "_flights": flights,
+                **attrs,
+            },
+        )
+    return models
 
 
 class Session:
@@ -14,31 +53,74 @@ class Session:
 
     :param cookies: Cookies
     :type cookies: str | dict[str, str] | None
+    :param cache: 响应缓存，为 :data:`None` 时不缓存
+    :type cache: Cache | None
+    :param rate_limiter: 限流器，为 :data:`None` 时不限流
+    :type rate_limiter: TokenBucket | None
+    :param backoff: 请求被限流或失败时的退避策略，为 :data:`None` 时不重试
+    :type backoff: Backoff | None
+    :param int pool_connections: 缓存的连接池（主机）数量
+    :param int pool_maxsize: 每个主机的最大连接数，多线程并发时应不小于线程数
+    :param bool pool_block: 值为真时，连接数达到上限后等待空闲连接；
+        否则新建连接且用完后丢弃
+    :param timeout: 请求超时（秒），可为 ``(连接超时, 读取超时)``
+    :type timeout: float | tuple[float, float] | None
+    :param bool compression: 是否接受压缩的响应
+    :param bool keep_alive: 是否复用连接
 
     :var requests.cookies.RequestsCookieJar cookies: Cookies
     :var requests.Session session: 会话
+    :var cache: 响应缓存
+    :vartype cache: Cache | None
+    :var weakref.WeakValueDictionary identity_map:
+        已构造的模型，同一 ID 的模型在存活期间只会被获取一次，
+        可使用 :meth:`~luogu.models.Model.refresh` 重新获取
+    :var type Paste: 使用该会话的 :class:`~luogu.Paste`
+    :var type Problem: 使用该会话的 :class:`~luogu.Problem`
+    :var type User: 使用该会话的 :class:`~luogu.User`
+    :var Hooks hooks: 请求事件钩子，可追加回调函数，如
+        ``s.hooks.response.append(lambda request, response, seconds: ...)``
+    :var Metrics metrics: 该会话的请求指标
     """
 
-    def __init__(self, cookies: "str | dict[str, str] | None" = None) -> None:
+    def __init__(
+        self,
+        cookies: "str | dict[str, str] | None" = None,
+        cache: "Cache | None" = None,
+        rate_limiter: "TokenBucket | None" = None,
+        backoff: "Backoff | None" = Backoff(),
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        timeout: "float | tuple[float, float] | None" = None,
+        compression: bool = True,
+        keep_alive: bool = True,
+    ) -> None:
         self.cookies = requests.cookies.cookiejar_from_dict(
             {k: v.value for k, v in SimpleCookie(cookies).items()}
         )
-        self.session = requests.Session()
-        self.session.headers["User-Agent"] = USER_AGENT
+        self.hooks = Hooks()
+        self.metrics = Metrics()
+        self.metrics.register(self.hooks)
+        self.session = make_session(
+            rate_limiter,
+            backoff,
+            pool_connections,
+            pool_maxsize,
+            pool_block,
+            timeout,
+            compression,
+            keep_alive,
+            self.hooks,
+        )
         self.session.headers["referer"] = "http://www.luogu.com.cn/"
         self.session.cookies = self.cookies
-        self.Paste._session = self.session
-        self.Problem._session = self.session
-        self.User._session = self.session
-
-    class Paste(Paste):
-        pass
-
-    class Problem(Problem):
-        pass
-
-    class User(User):
-        pass
+        self.cache = cache
+        self.identity_map = WeakValueDictionary()
+        models = _bind(self, _session=self.session, _cache=cache, _hooks=self.hooks)
+        self.Paste = models[Paste]
+        self.Problem = models[Problem]
+        self.User = models[User]
 
     def captcha(self, show: bool = True) -> bytes:
         """获取验证码
@@ -66,20 +148,18 @@ class Session:
         :rtype: dict[str]
         """
 
-        r = self.session.post(
+        r = post_with_csrf_token(
+            self.session,
             "https://www.luogu.com.cn/api/auth/userPassLogin",
-            headers={
-                "x-csrf-token": get_csrf_token(
-                    self.session, "https://www.luogu.com.cn/auth/login"
-                ),
-            },
-            json={
+            {
                 "username": username,
                 "password": password,
                 "captcha": captcha,
             },
+            "https://www.luogu.com.cn/auth/login",
         )
         r.raise_for_status()
+        csrf_tokens.invalidate(self.session)
         return r.json()
 
     def logout(self) -> "dict[str, bool]":
@@ -87,9 +167,304 @@ class Session:
 
         :rtype: dict[str, bool]
         """
-        r = self.session.post(
-            "https://www.luogu.com.cn/api/auth/logout",
-            headers={"x-csrf-token": get_csrf_token(self.session)},
+        r = post_with_csrf_token(
+            self.session, "https://www.luogu.com.cn/api/auth/logout"
         )
         r.raise_for_status()
+        csrf_tokens.invalidate(self.session)
         return r.json()
+
+    def save(self, path: str, key: bytes) -> None:
+        """将 Cookies 和 CSRF 令牌加密保存到文件，需要安装 ``cryptography``
+
+        .. code:: python
+
+            key = cryptography.fernet.Fernet.generate_key()
+            s.save("session.bin", key)
+            s = luogu.Session.load("session.bin", key)
+
+        :param str path: 文件路径
+        :param bytes key: :class:`cryptography.fernet.Fernet` 密钥
+        """
+        from cryptography.fernet import Fernet
+
+        csrf = csrf_tokens.peek(self.session)
+        state = {
+            "cookies": [
+                {
+                    "name": c.name,
+                    "value": c.value,
+                    "domain": c.domain,
+                    "path": c.path,
+                    "expires": c.expires,
+                    "secure": c.secure,
+                }
+                for c in self.cookies
+            ],
+            "csrf_token": None if csrf is None else csrf[0],
+            "csrf_expires": None if csrf is None else time() + csrf[1],
+        }
+        data = Fernet(key).encrypt(json.dumps(state).encode())
+        tmp = f"{path}.tmp"
+        with open(
+            os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb"
+        ) as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, key: bytes, **kwargs) -> "Session":
+        """从 :meth:`save` 保存的文件恢复会话，需要安装 ``cryptography``
+
+        :param str path: 文件路径
+        :param bytes key: 保存时使用的密钥
+        :param kwargs: 传给 :class:`Session` 的其他参数
+
+        :raises cryptography.fernet.InvalidToken: 密钥错误或文件已损坏
+        """
+        from cryptography.fernet import Fernet
+
+        with open(path, "rb") as f:
+            state = json.loads(Fernet(key).decrypt(f.read()))
+        self = cls(**kwargs)
+        for cookie in state["cookies"]:
+            self.cookies.set_cookie(requests.cookies.create_cookie(**cookie))
+        if state["csrf_token"] is not None and state["csrf_expires"] > time():
+            csrf_tokens.set(
+                self.session, state["csrf_token"], state["csrf_expires"] - time()
+            )
+        return self
+
+    @property
+    def uid(self) -> "int | None":
+        """已登录用户的 ID，根据 Cookies 判断，未登录时为 :data:`None`"""
+        self.cookies.clear_expired_cookies()
+        uid = self.cookies.get("_uid")
+        return int(uid) if uid and uid != "0" else None
+
+    def validate(self) -> bool:
+        """检查会话是否仍处于登录状态
+
+        Cookies 中没有用户 ID 时直接返回假；否则获取该用户的页面，
+        检查响应中的当前用户是否为该用户。
+        """
+        uid = self.uid
+        if uid is None:
+            return False
+        data = self.User._get(self.User._url.format(uid), check=False, refresh=True)
+        return (data.get("currentUser") or {}).get("uid") == uid
+
+
+class SessionPool:
+    """已登录会话池
+
+    多个工作线程可以从池中借出会话，用完后自动归还。
+    借出前会检查距离上次验证超过 *revalidate* 秒的会话，丢弃已失效的会话。
+
+    .. code:: python
+
+        pool = luogu.SessionPool(
+            luogu.Session.load(path, key) for path in paths
+        )
+        with pool.checkout() as s:
+            s.Paste.new("Hello, world!")
+
+    :param sessions: 初始的会话
+    :type sessions: Iterable[Session]
+    :param factory: 池中没有可用会话时用于创建新会话的函数，如加载文件或登录，
+        为 :data:`None` 时等待其他线程归还会话
+    :param float revalidate: 验证会话的间隔（秒）
+    """
+
+    def __init__(
+        self,
+        sessions: "Iterable[Session]" = (),
+        factory=None,
+        revalidate: float = 600,
+    ) -> None:
+        self.factory = factory
+        self.revalidate = revalidate
+        self._queue = Queue()
+        self._validated: "dict[int, float]" = {}
+        self._lock = Lock()
+        for session in sessions:
+            self.add(session)
+
+    def add(self, session: Session, validated: bool = False) -> None:
+        """将会话放入池中
+
+        :param Session session: 会话
+        :param bool validated: 值为真时表示会话刚刚验证过
+        """
+        with self._lock:
+            self._validated[id(session)] = time() if validated else 0
+        self._queue.put(session)
+
+    def _discard(self, session: Session) -> None:
+        with self._lock:
+            self._validated.pop(id(session), None)
+
+    def _get(self, timeout: "float | None") -> Session:
+        while True:
+            try:
+                session = self._queue.get(self.factory is None, timeout)
+            except Empty:
+                if self.factory is None:
+                    raise
+                session = self.factory()
+                with self._lock:
+                    self._validated[id(session)] = time()
+                return session
+            with self._lock:
+                validated = self._validated.get(id(session), 0)
+            if time() - validated < self.revalidate:
+                return session
+            if session.validate():
+                with self._lock:
+                    self._validated[id(session)] = time()
+                return session
+            self._discard(session)
+
+    @contextmanager
+    def checkout(self, timeout: "float | None" = None) -> "Iterator[Session]":
+        """借出会话，退出 ``with`` 语句时归还
+
+        :param timeout: 等待可用会话的最长时间（秒），为 :data:`None` 时一直等待
+        :type timeout: float | None
+
+        :raises queue.Empty: 超时
+        """
+        session = self._get(timeout)
+        try:
+            yield session
+        finally:
+            self._queue.put(session)
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+
+def set_default_session(session: Session) -> None:
+    """将 *session* 的连接池、Cookies、缓存和钩子设为 :class:`~luogu.User` 等模型默认使用的
+
+    默认会话的连接池较小，高并发时可替换为连接池更大的会话：
+
+    .. code:: python
+
+        luogu.set_default_session(luogu.Session(pool_maxsize=64))
+
+    :param Session session: 会话
+    """
+    Model._session = session.session
+    Model._cache = session.cache
+    Model._hooks = session.hooks
+
+
+class AsyncSession:
+    """异步会话
+
+    基于 ``httpx`` 的连接池，所有模型共用同一个 :class:`httpx.AsyncClient`，
+    可在同一个事件循环中并发获取大量模型。
+
+    .. code:: python
+
+        async with luogu.AsyncSession() as s:
+            users = await asyncio.gather(*(s.User.fetch(uid) for uid in uids))
+
+    该会话的模型只能通过 :meth:`~luogu.models.Model.fetch` 获取。
+    需要发送同步请求的方法和属性，如直接构造模型 ``s.User(uid)``、
+    :meth:`~luogu.models.Model.refresh`、:meth:`User.search`、
+    :class:`Paste` 的新建、修改和删除，以及尚未获取的关联属性（如
+    :attr:`Problem.provider`），均抛出 :exc:`RuntimeError`，
+    而不会改用不带该会话 Cookies、限流器和钩子的默认会话。
+    已通过 :meth:`~luogu.models.Model.fetch` 获取的模型在存活期间可直接构造，
+    使用 ``await s.User.fetch(uid, refresh=True)`` 重新获取。
+
+    :param cookies: Cookies
+    :type cookies: str | dict[str, str] | None
+    :param int max_connections: 最大连接数
+    :param max_keepalive_connections: 最大空闲连接数，默认同 *max_connections*
+    :type max_keepalive_connections: int | None
+    :param cache: 响应缓存，为 :data:`None` 时不缓存
+    :type cache: Cache | None
+    :param rate_limiter: 限流器，可与其他会话共享，为 :data:`None` 时不限流
+    :type rate_limiter: TokenBucket | None
+    :param backoff: 请求被限流或失败时的退避策略，为 :data:`None` 时不重试
+    :type backoff: Backoff | None
+    :param timeout: 请求超时（秒）
+    :type timeout: float | None
+    :param bool http2: 值为真且安装了 ``h2`` 时使用 HTTP/2
+    :param bool compression: 是否接受压缩的响应
+    :param bool keep_alive: 是否复用连接
+
+    :var httpx.AsyncClient client: 异步 HTTP 客户端
+    :var weakref.WeakValueDictionary identity_map: 已获取的模型
+    :var type Paste: 使用该会话的 :class:`~luogu.Paste`
+    :var type Problem: 使用该会话的 :class:`~luogu.Problem`
+    :var type User: 使用该会话的 :class:`~luogu.User`
+    :var Hooks hooks: 请求事件钩子
+    :var Metrics metrics: 该会话的请求指标
+    """
+
+    def __init__(
+        self,
+        cookies: "str | dict[str, str] | None" = None,
+        max_connections: int = 100,
+        cache: "Cache | None" = None,
+        rate_limiter: "TokenBucket | None" = None,
+        backoff: "Backoff | None" = Backoff(),
+        max_keepalive_connections: "int | None" = None,
+        timeout: "float | None" = 5,
+        http2: bool = False,
+        compression: bool = True,
+        keep_alive: bool = True,
+    ) -> None:
+        import httpx
+
+        headers = {
+            "User-Agent": USER_AGENT,
+            "referer": "http://www.luogu.com.cn/",
+        }
+        if not compression:
+            headers["Accept-Encoding"] = "identity"
+        if max_keepalive_connections is None:
+            max_keepalive_connections = max_connections
+        self.hooks = Hooks()
+        self.metrics = Metrics()
+        self.metrics.register(self.hooks)
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            cookies={k: v.value for k, v in SimpleCookie(cookies).items()},
+            timeout=timeout,
+            transport=AsyncLuoguTransport(
+                httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=max_connections,
+                        max_keepalive_connections=(
+                            max_keepalive_connections if keep_alive else 0
+                        ),
+                    ),
+                    http2=http2 and find_spec("h2") is not None,
+                ),
+                rate_limiter,
+                backoff,
+                self.hooks,
+            ),
+        )
+        self.identity_map = WeakValueDictionary()
+        models = _bind(
+            self, _session=None, _client=self.client, _cache=cache, _hooks=self.hooks
+        )
+        self.Paste = models[Paste]
+        self.Problem = models[Problem]
+        self.User = models[User]
+
+    async def close(self) -> None:
+        """关闭连接池"""
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -1,56 +1,545 @@
-from html.parser import HTMLParser
+import asyncio
+import re
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from html import unescape
+from threading import Lock
+from time import monotonic
+from typing import Iterable
+from weakref import WeakKeyDictionary, WeakValueDictionary
 
 import requests
 
+from .columns import Columnar
+from .exceptions import CSRFTokenNotFoundException, HttpException
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+    loads = orjson.loads
+elif msgspec is not None:
+    JSON_BACKEND = "msgspec"
+    loads = msgspec.json.decode
+else:
+    import json
+
+    JSON_BACKEND = "json"
+    loads = json.loads
+
+CSRF_TOKEN_REJECTED = (403, 419)
+
 
 def dict_without_underscores(d: dict):
     return dict(filter(lambda i: not i[0].startswith("_"), d.items()))
 
 
+def project(data, schema):
+    """按 *schema* 仅保留 *data* 中需要的字段
+
+    *schema* 为 :data:`None` 时保留整个值；为字典时仅保留其中的键，并按对应的值递归处理；
+    为只含一个元素的列表时，按该元素处理 *data* 中的每一项。
+
+    >>> project({"a": 1, "b": [{"c": 2, "d": 3}]}, {"b": [{"c": None}]})
+    {'b': [{'c': 2}]}
+    """
+    if schema is None or data is None:
+        return data
+    if isinstance(schema, list):
+        return [project(item, schema[0]) for item in data]
+    return {
+        key: project(data[key], value) for key, value in schema.items() if key in data
+    }
+
+
+def _schema_type(schema, name: str = "Schema"):
+    """将 *schema* 转为 ``msgspec`` 可解码的类型，字典转为所有键均可缺失的 TypedDict"""
+    from typing import Any, List, Optional, TypedDict
+
+    if schema is None:
+        return Any
+    if isinstance(schema, list):
+        return Optional[List[_schema_type(schema[0], name)]]
+    return Optional[
+        TypedDict(
+            name,
+            {k: _schema_type(v, f"{name}_{k}") for k, v in schema.items()},
+            total=False,
+        )
+    ]
+
+
+_decoders: "dict[int, tuple]" = {}
+
+
+def decode(content: bytes, schema=None):
+    """解码 JSON 并按 *schema* 仅保留需要的字段，结果同 ``project(loads(content), schema)``
+
+    安装了 ``msgspec`` 时按 *schema* 构造类型化的解码器，解码时直接跳过不需要的字段，
+    不会为其构造对象；否则完整解码后再由 :func:`project` 裁剪。
+
+    >>> decode(b'{"a": 1, "b": [{"c": 2, "d": 3}]}', {"b": [{"c": None}]})
+    {'b': [{'c': 2}]}
+    """
+    if schema is None:
+        return loads(content)
+    if msgspec is None:
+        return project(loads(content), schema)
+    entry = _decoders.get(id(schema))
+    if entry is None or entry[0] is not schema:
+        # 保存 schema 本身，防止其 id 被其他对象复用
+        decoder = msgspec.json.Decoder(_schema_type(schema))
+        entry = _decoders[id(schema)] = (schema, decoder)
+    return entry[1].decode(content)
+
+
+_META_TAG = re.compile(rb"<meta\s[^>]*>", re.I)
+_ATTRIBUTE = re.compile(rb"""([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_HEAD_END = re.compile(rb"</head[\s>]|<body[\s>]", re.I)
+
+
+def extract_csrf_token(chunks: "Iterable[bytes]") -> "str | None":
+    """从逐块读取的 HTML 中提取 ``<meta name="csrf-token">`` 的内容
+
+    读到令牌或 ``<head>`` 结束后立即停止，不会读取剩余的块。
+
+    :param chunks: HTML 的字节块
+    :type chunks: Iterable[bytes]
+
+    :returns: CSRF 令牌，``<head>`` 中没有令牌时为 :data:`None`
+    :rtype: str | None
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        end = 0
+        for tag in _META_TAG.finditer(buffer):
+            attrs = {
+                m[1].lower(): m[2] or m[3] or m[4] or b""
+                for m in _ATTRIBUTE.finditer(tag[0])
+            }
+            if attrs.get(b"name") == b"csrf-token":
+                return unescape(attrs.get(b"content", b"").decode())
+            end = tag.end()
+        if _HEAD_END.search(buffer, end):
+            return None
+        # 仅保留可能未读完的标签
+        start = buffer.rfind(b"<", end)
+        buffer = buffer[start:] if start != -1 else b""
+    return None
+
+
 def get_csrf_token(
     session: requests.Session, url: str = "https://www.luogu.com.cn/"
 ) -> str:
-    class HTMLCSRFTokenParser(HTMLParser):
-        def handle_starttag(self, tag, attrs):
-            attrs = dict(attrs)
-            try:
-                if tag == "meta" and attrs["name"] == "csrf-token":
-                    raise StopIteration(attrs["content"])
-            except KeyError:
-                pass
+    """获取 *url* 页面中的 CSRF 令牌，读到令牌后即停止接收页面
+
+    :raises CSRFTokenNotFoundException: 页面中没有 CSRF 令牌
+    """
+    with session.get(url, stream=True) as r:
+        r.raise_for_status()
+        token = extract_csrf_token(r.iter_content(4096))
+    if token is None:
+        raise CSRFTokenNotFoundException(f"CSRF token not found in {url}")
+    return token
+
+
+class CSRFTokenCache:
+    """CSRF 令牌缓存
+
+    按会话缓存 CSRF 令牌，避免每次 POST 都请求并解析一次页面。
+
+    :param float ttl: 令牌有效期（秒）
+    """
+
+    def __init__(self, ttl: float = 1800) -> None:
+        self.ttl = ttl
+        self._lock = Lock()
+        self._tokens = WeakKeyDictionary()
+
+    def get(
+        self, session: requests.Session, url: str = "https://www.luogu.com.cn/"
+    ) -> str:
+        """获取会话的 CSRF 令牌，缓存未命中或已过期时从 *url* 获取"""
+        with self._lock:
+            token, expires = self._tokens.get(session, (None, 0))
+        if expires > monotonic():
+            return token
+        token = get_csrf_token(session, url)
+        with self._lock:
+            self._tokens[session] = (token, monotonic() + self.ttl)
+        return token
+
+    def peek(self, session: requests.Session) -> "tuple[str, float] | None":
+        """不发送请求，返回会话缓存的 CSRF 令牌及其剩余有效期（秒），未缓存或已过期时返回 :data:`None`"""
+        with self._lock:
+            token, expires = self._tokens.get(session, (None, 0))
+        remaining = expires - monotonic()
+        return (token, remaining) if remaining > 0 else None
+
+    def set(
+        self, session: requests.Session, token: str, ttl: "float | None" = None
+    ) -> None:
+        """设置会话的 CSRF 令牌，*ttl* 为 :data:`None` 时使用默认有效期"""
+        with self._lock:
+            self._tokens[session] = (
+                token,
+                monotonic() + (self.ttl if ttl is None else ttl),
+            )
+
+    def invalidate(self, session: "requests.Session | None" = None) -> None:
+        """使会话的 CSRF 令牌失效，*session* 为 :data:`None` 时清空缓存"""
+        with self._lock:
+            if session is None:
+                self._tokens.clear()
+            else:
+                self._tokens.pop(session, None)
+
+
+csrf_tokens = CSRFTokenCache()
+
+
+def post_with_csrf_token(
+    session: requests.Session,
+    url: str,
+    json: dict = None,
+    csrf_url: str = "https://www.luogu.com.cn/",
+) -> requests.Response:
+    """携带缓存的 CSRF 令牌发送 POST 请求，令牌被拒绝时刷新令牌并重试一次"""
+
+    def post():
+        return session.post(
+            url,
+            json=json,
+            headers={"x-csrf-token": csrf_tokens.get(session, csrf_url)},
+        )
+
+    r = post()
+    if r.status_code in CSRF_TOKEN_REJECTED:
+        csrf_tokens.invalidate(session)
+        r = post()
+    return r
+
+
+class SingleFlight:
+    """合并并发的相同请求
+
+    同一个键同时只会执行一次，其他并发调用者等待并共享其结果或异常。
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._calls: "dict[str, Future]" = {}
+        self._async_calls: "dict[str, asyncio.Future]" = {}
+
+    def do(self, key: str, func):
+        """执行 ``func()``，*key* 相同的调用正在进行时等待其结果"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key: str, func):
+        """等待 ``func()``，*key* 相同的调用正在进行时等待其结果
 
-    r = session.get(url)
-    r.raise_for_status()
+        ``func()`` 在单独的任务中执行，取消任一调用者（包括首个调用者）
+        不会取消该任务，也不影响其他调用者。
+        """
+        task = self._async_calls.get(key)
+        if task is None:
+            task = self._async_calls[key] = asyncio.ensure_future(func())
+
+            def done(task: asyncio.Future) -> None:
+                if self._async_calls.get(key) is task:
+                    del self._async_calls[key]
+                if not task.cancelled():
+                    task.exception()  # 没有调用者等待时避免警告
+
+            task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+
+class cached_property:
+    """首次访问时计算并保存到实例 ``__dict__`` 中的属性"""
+
+    def __init__(self, func) -> None:
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name] = self.func(instance)
+        return value
+
+
+_KWARGS_MARK = object()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(map(_freeze, value))
+    if isinstance(value, dict):
+        return dict, frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def _make_key(args: tuple, kwargs: dict):
+    key = args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items())) if kwargs else args
     try:
-        HTMLCSRFTokenParser().feed(r.text)
-    except StopIteration as csrf_token:
-        return str(csrf_token)
+        hash(key)
+    except TypeError:
+        key = _freeze(key)
+        hash(key)
+    return key
+
+
+class _CachedMethod:
+    def __init__(self, func, maxsize: "int | str | None", weak: bool) -> None:
+        self.func = func
+        self.maxsize = maxsize
+        self.weak = weak
+        self.attr = f"_cached_{func.__name__}"
+        self.weak_attr = f"_weak_cached_{func.__name__}"
+        self.lock = Lock()
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return _BoundCachedMethod(self, instance)
+
+    def storage(self, instance) -> OrderedDict:
+        with self.lock:
+            return instance.__dict__.setdefault(self.attr, OrderedDict())
+
+    def weak_storage(self, instance) -> WeakValueDictionary:
+        with self.lock:
+            return instance.__dict__.setdefault(self.weak_attr, WeakValueDictionary())
+
+    def limit(self, instance) -> "int | None":
+        if isinstance(self.maxsize, str):
+            return getattr(instance, self.maxsize)
+        return self.maxsize
+
+
+class _BoundCachedMethod:
+    __slots__ = ("method", "instance")
+
+    def __init__(self, method: _CachedMethod, instance) -> None:
+        self.method = method
+        self.instance = instance
+
+    def __call__(self, *args, **kwargs):
+        method = self.method
+        try:
+            key = _make_key(args, kwargs)
+        except TypeError:
+            return method.func(self.instance, *args, **kwargs)
+        cache = method.storage(self.instance)
+        weak = method.weak_storage(self.instance) if method.weak else None
+        with method.lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+            value = None if weak is None else weak.get(key)
+        if value is None:
+            value = method.func(self.instance, *args, **kwargs)
+        maxsize = method.limit(self.instance)
+        with method.lock:
+            cache[key] = value
+            while maxsize is not None and len(cache) > maxsize:
+                cache.popitem(last=False)
+            if weak is not None:
+                try:
+                    weak[key] = value
+                except TypeError:
+                    pass
+        return value
+
+    def invalidate(self, *args, **kwargs) -> None:
+        """使指定参数的缓存失效"""
+        key = _make_key(args, kwargs)
+        cache = self.method.storage(self.instance)
+        with self.method.lock:
+            cache.pop(key, None)
+            self.instance.__dict__.get(self.method.weak_attr, {}).pop(key, None)
+
+    def cache_clear(self) -> None:
+        """清空缓存"""
+        self.instance.__dict__.pop(self.method.attr, None)
+        self.instance.__dict__.pop(self.method.weak_attr, None)
+
 
+def cached_method(func=None, *, maxsize: "int | str | None" = None, weak: bool = False):
+    """按实例缓存方法的返回值
 
-def cached_method(func):
-    def wrapper(self, *args):
-        if not hasattr(self, "__cache"):
-            self.__cache = {}
-        cache = self.__cache
-        if args not in cache:
-            cache[args] = func(self, *args)
-        return cache[args]
+    每个方法的缓存单独保存在实例的 ``__dict__`` 中，随实例一同释放。
+    支持关键字参数；不可哈希的参数会被转换为可哈希的形式，无法转换时不缓存。
 
-    return wrapper
+    .. code:: python
 
+        class Foo:
+            @cached_method(maxsize=128)
+            def bar(self, x):
+                ...
 
-class LazyList(list):
-    def __init__(self, model, args):
+        foo.bar.invalidate(1)
+        foo.bar.cache_clear()
+
+    :param maxsize: 每个实例最多缓存的结果数，超出时淘汰最久未使用的结果，
+        为 :data:`None` 时不限制；为字符串时取实例的同名属性，以便每个实例各自设置
+    :type maxsize: int | str | None
+    :param bool weak: 值为真时另以弱引用保存所有结果，被淘汰的结果若仍在其他地方被引用，
+        再次调用时直接返回而不重新计算；不支持弱引用的结果不会被弱引用保存
+    """
+    if func is None:
+        return lambda func: _CachedMethod(func, maxsize, weak)
+    return _CachedMethod(func, maxsize, weak)
+
+
+class LazyList(list, Columnar):
+    """惰性列表，元素在首次访问时才会获取，索引和迭代共用同一份缓存
+
+    :param model: 元素的模型
+    :param args: 元素的 ID
+    :param int window: 迭代时提前并发获取的元素数量，为 0 时不预取
+    :param int max_workers: 预取使用的最大线程数
+    :param maxsize: 最多保留的已获取元素数，超出时释放最久未访问的元素，
+        为 :data:`None` 时不限制。被释放的元素若仍在其他地方被引用，
+        再次访问时直接返回，不会重新获取
+    :type maxsize: int | None
+
+    :var maxsize: 同参数 *maxsize*，可在使用中修改，如
+        ``user.passed_problems.maxsize = 100``
+    """
+
+    def __init__(
+        self,
+        model,
+        args,
+        window: int = 0,
+        max_workers: int = 8,
+        maxsize: "int | None" = None,
+    ):
         super().__init__(args)
         self._model = model
+        self.window = window
+        self.max_workers = max_workers
+        self.maxsize = maxsize
 
-    @cached_method
-    def __getitem__(self, index):
+    @cached_method(maxsize="maxsize", weak=True)
+    def _load(self, index: int):
         return self._model(super().__getitem__(index))
 
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyList(
+                self._model,
+                super().__getitem__(index),
+                self.window,
+                self.max_workers,
+                self.maxsize,
+            )
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        return self._load(index)
+
     def __iter__(self):
-        for i in super().__iter__():
-            yield self._model(i)
+        if not self.window:
+            for i in range(len(self)):
+                yield self._load(i)
+            return
+        with ThreadPoolExecutor(min(self.window, self.max_workers)) as executor:
+            futures = deque()
+            try:
+                for i in range(len(self)):
+                    while len(futures) <= self.window and i + len(futures) < len(self):
+                        futures.append(executor.submit(self._load, i + len(futures)))
+                    yield futures.popleft().result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def prefetch(self, n: "int | None" = None, start: int = 0) -> "LazyList":
+        """并发获取从 *start* 开始的 *n* 个元素并缓存
+
+        获取失败的元素不会被缓存，异常将在访问该元素时抛出。
+        设置了 *maxsize* 时最多保留最后获取的 *maxsize* 个元素。
+
+        :param n: 元素数量，为 :data:`None` 时获取之后的所有元素
+        :type n: int | None
+        :param int start: 起始下标
+        """
+        indices = range(start, len(self) if n is None else min(start + n, len(self)))
+
+        def load(index):
+            try:
+                self._load(index)
+            except HttpException:
+                pass
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for _ in executor.map(load, indices):
+                pass
+        return self
+
+    def materialize(self, concurrency: "int | None" = None) -> list:
+        """并发获取所有元素
+
+        :param concurrency: 最大线程数，默认为 *max_workers*
+        :type concurrency: int | None
+
+        :rtype: list
+        """
+        with ThreadPoolExecutor(concurrency or self.max_workers) as executor:
+            return list(executor.map(self._load, range(len(self))))
+
+    def __reduce__(self):
+        # 与会话绑定的模型无法序列化，反序列化后使用公开模型，即默认会话
+        model = self._model
+        if hasattr(model, "_public_model"):
+            model = model._public_model()
+        return (
+            self.__class__,
+            (
+                model,
+                list(list.__iter__(self)),
+                self.window,
+                self.max_workers,
+                self.maxsize,
+            ),
+        )
 
     def __repr__(self) -> str:
         return (
@@ -58,3 +547,7 @@ class LazyList(list):
             + ",\n ".join([f"{self._model.__name__}({i})" for i in list.__iter__(self)])
             + "]"
         )
+
+    def cache_clear(self) -> None:
+        """释放已获取的模型"""
+        self._load.cache_clear()
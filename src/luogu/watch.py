@@ -0,0 +1,253 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from heapq import heappop, heappush
+from itertools import count
+from sys import intern
+from time import monotonic, sleep
+from typing import Iterator
+
+import requests
+
+from .exceptions import HttpException
+from .models import Model
+from .models.main import Problem, User
+
+Change = namedtuple("Change", ("model", "id", "field", "old", "new"))
+Change.__doc__ = """变化
+
+对于题目列表等集合字段，*old* 为移除的元素，*new* 为新增的元素；
+其他字段为变化前后的值。
+
+:var type model: 模型，如 :class:`~luogu.User`
+:var id: 模型 ID
+:var str field: 字段名，如 ``passed_problems``、``ranking``
+:var old: 变化前的值
+:var new: 变化后的值
+"""
+
+# 各模型监视的字段，以及集合字段（取 ``_<字段名>`` 中的题目 ID）
+FIELDS = {
+    User: (
+        "ranking",
+        "follower_count",
+        "following_count",
+        "passed_problem_count",
+        "submitted_problem_count",
+    ),
+    Problem: ("title", "difficulty", "total_submit", "total_accepted"),
+}
+SETS = {
+    User: ("passed_problems", "submitted_problems"),
+    Problem: (),
+}
+
+
+class _Target:
+    __slots__ = ("model", "id", "interval", "min_interval", "max_interval", "due")
+
+    def __init__(self, model, id, interval, min_interval, max_interval) -> None:
+        self.model = model
+        self.id = id
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.due = 0.0
+
+
+class Watcher:
+    """轮询用户和题目，仅返回变化
+
+    每个目标有各自的轮询间隔：发生变化后间隔减半，以便更频繁地轮询近期活跃的目标；
+    未发生变化时间隔逐渐延长，直至 *max_interval*。
+    每个目标仅保存上次轮询的快照，即内容指纹和监视字段的值，
+    内容指纹未变化时不再比较字段。首次轮询仅记录快照，不返回变化。
+
+    .. code:: python
+
+        watcher = luogu.Watcher(interval=600)
+        for uid in uids:
+            watcher.watch_user(uid)
+        for change in watcher.run():
+            if change.field == "passed_problems":
+                print(change.id, "通过了", change.new)
+
+    :param session: 用于轮询的会话，为 :data:`None` 时使用默认会话
+    :type session: Session | None
+    :param float interval: 默认轮询间隔（秒）
+    :param float min_interval: 最短轮询间隔（秒）
+    :param float max_interval: 最长轮询间隔（秒）
+    :param int max_workers: 每轮并发请求的最大线程数
+
+    获取失败（包括网络错误）的目标本轮不记录快照，按原间隔继续轮询。
+    """
+
+    def __init__(
+        self,
+        session=None,
+        interval: float = 300,
+        min_interval: float = 60,
+        max_interval: float = 3600,
+        max_workers: int = 8,
+    ) -> None:
+        self._models = {
+            User: User if session is None else session.User,
+            Problem: Problem if session is None else session.Problem,
+        }
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_workers = max_workers
+        self._targets: "dict[tuple[type, str], _Target]" = {}
+        self._snapshots: "dict[tuple[type, str], tuple]" = {}
+        self._schedule: "list[tuple[float, int, tuple[type, str]]]" = []
+        self._counter = count()
+
+    def _watch(self, model: type, id, interval: "float | None") -> None:
+        key = (model, str(id))
+        interval = self.interval if interval is None else interval
+        target = _Target(
+            model,
+            id,
+            interval,
+            min(self.min_interval, interval),
+            max(self.max_interval, interval),
+        )
+        self._targets[key] = target
+        self._push(key, target, monotonic())
+
+    def watch_user(self, uid: "int | str", interval: "float | None" = None) -> None:
+        """监视用户，下一轮即开始轮询
+
+        :param uid: 用户 ID
+        :type uid: int | str
+        :param interval: 初始轮询间隔（秒），为 :data:`None` 时使用默认间隔
+        :type interval: float | None
+        """
+        self._watch(User, uid, interval)
+
+    def watch_problem(self, pid: str, interval: "float | None" = None) -> None:
+        """监视题目，下一轮即开始轮询
+
+        :param str pid: 题目 ID
+        :param interval: 初始轮询间隔（秒），为 :data:`None` 时使用默认间隔
+        :type interval: float | None
+        """
+        self._watch(Problem, pid, interval)
+
+    def unwatch(self, model: type, id: "int | str") -> None:
+        """停止监视并丢弃快照
+
+        :param type model: :class:`~luogu.User` 或 :class:`~luogu.Problem`
+        :param id: 模型 ID
+        :type id: int | str
+        """
+        key = (model, str(id))
+        self._targets.pop(key, None)
+        self._snapshots.pop(key, None)
+
+    def _push(self, key: "tuple[type, str]", target: _Target, due: float) -> None:
+        target.due = due
+        heappush(self._schedule, (due, next(self._counter), key))
+
+    def _fetch(self, target: _Target) -> "Model | None":
+        model = self._models[target.model]
+        try:
+            current_data = model._get(model._url.format(target.id), refresh=True)[
+                "currentData"
+            ]
+        except (HttpException, requests.RequestException):
+            return None
+        return model.from_current_data(current_data)
+
+    @staticmethod
+    def _snapshot(model: type, instance: Model) -> tuple:
+        sets = []
+        for name in SETS[model]:
+            problems = getattr(instance, f"_{name}") or ()
+            sets.append(frozenset(intern(p["pid"]) for p in problems))
+        return (
+            instance.fingerprint,
+            tuple(getattr(instance, name, None) for name in FIELDS[model]),
+            tuple(sets),
+        )
+
+    @staticmethod
+    def _diff(model: type, id, old: tuple, new: tuple) -> "list[Change]":
+        changes = []
+        for name, a, b in zip(FIELDS[model], old[1], new[1]):
+            if a != b:
+                changes.append(Change(model, id, name, a, b))
+        for name, a, b in zip(SETS[model], old[2], new[2]):
+            if a != b:
+                changes.append(
+                    Change(model, id, name, tuple(sorted(a - b)), tuple(sorted(b - a)))
+                )
+        return changes
+
+    def poll(self, limit: "int | None" = None) -> "list[Change]":
+        """轮询已到期的目标
+
+        :param limit: 本轮最多轮询的目标数，优先轮询最早到期的目标，
+            为 :data:`None` 时轮询所有到期的目标
+        :type limit: int | None
+
+        :rtype: list[Change]
+        """
+        now = monotonic()
+        due = []
+        while self._schedule and self._schedule[0][0] <= now:
+            if limit is not None and len(due) >= limit:
+                break
+            time, _, key = heappop(self._schedule)
+            target = self._targets.get(key)
+            if target is not None and target.due == time:
+                due.append((key, target))
+        if not due:
+            return []
+        try:
+            with ThreadPoolExecutor(min(self.max_workers, len(due))) as executor:
+                instances = list(executor.map(self._fetch, (t for _, t in due)))
+        except BaseException:
+            # 已出队的目标必须重新入队，否则将不再被轮询
+            now = monotonic()
+            for key, target in due:
+                self._push(key, target, now + target.interval)
+            raise
+        changes = []
+        now = monotonic()
+        for (key, target), instance in zip(due, instances):
+            if key not in self._targets:
+                continue
+            if instance is not None:
+                snapshot = self._snapshot(target.model, instance)
+                old = self._snapshots.get(key)
+                self._snapshots[key] = snapshot
+                if old is not None and old[0] != snapshot[0]:
+                    delta = self._diff(target.model, target.id, old, snapshot)
+                    changes.extend(delta)
+                else:
+                    delta = None
+                if delta:
+                    target.interval = max(target.min_interval, target.interval / 2)
+                elif old is not None:
+                    target.interval = min(target.max_interval, target.interval * 1.5)
+            self._push(key, target, now + target.interval)
+        return changes
+
+    def run(self) -> "Iterator[Change]":
+        """持续轮询，逐个返回变化，没有监视目标时结束
+
+        :rtype: Iterator[Change]
+        """
+        while self._targets:
+            while self._schedule and self._schedule[0][2] not in self._targets:
+                heappop(self._schedule)
+            if not self._schedule:
+                return
+            delay = self._schedule[0][0] - monotonic()
+            if delay > 0:
+                sleep(delay)
+            yield from self.poll()
+
+    def __len__(self) -> int:
+        return len(self._targets)
@@ -1,10 +1,28 @@
+import asyncio
+import copy
+import gc
+import json
 import os
+import pickle
+import re
+import tempfile
 import unittest
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from time import sleep
+from time import monotonic, sleep
 
 import luogu
 import requests
+from benchmarks.server import Handler, patch, patch_async, serve
+from luogu.utils import (
+    SingleFlight,
+    cached_method,
+    csrf_tokens,
+    decode,
+    extract_csrf_token,
+    project,
+)
 from requests.cookies import RequestsCookieJar
 
 
@@ -16,12 +34,17 @@ class TestCase(unittest.TestCase):
 
 class TestUser(TestCase):
     def test_404(self):
-        self.assertRaisesRegex(luogu.NotFoundHttpException, r"^用户未找到$", luogu.User, 0)
+        self.assertRaisesRegex(
+            luogu.NotFoundHttpException, r"^用户未找到$", luogu.User, 0
+        )
         self.assertEqual(len(luogu.User.search("0")), 0)
 
     def test_equal(self):
         u = luogu.User(1)
         self.assertEqual(u, luogu.User.search("kkksc03")[0])
+        summary = next(luogu.User.search_iter("kkksc03"))
+        self.assertEqual(summary.name, "kkksc03")
+        self.assertEqual(summary.resolve(), u)
         self.assertNotEqual(u, luogu.User(2))
         self.assertNotEqual(u, 1)
 
@@ -57,6 +80,50 @@ class TestUser(TestCase):
         self.assertIsInstance(next(iter(submitted_problems)), luogu.Problem)
         self.assertIsInstance(submitted_problems[0].provider, luogu.User)
 
+    def test_summaries(self):
+        u = luogu.User(108135)
+        summaries = u.passed_problem_summaries
+        self.assertEqual(summaries.pids, [p.pid for p in u.passed_problems])
+        self.assertEqual(summaries[0].title, u.passed_problems[0].title)
+        self.assertEqual(summaries[0].resolve(), u.passed_problems[0])
+        self.assertEqual(
+            summaries[:2].resolve().materialize(),
+            u.passed_problems[:2].materialize(),
+        )
+        self.assertEqual(len(u.submitted_problem_summaries), len(u.submitted_problems))
+
+    def test_columns(self):
+        u = luogu.User(108135)
+        summaries = u.passed_problem_summaries
+        columns = summaries.to_columns(["pid", "difficulty"])
+        self.assertEqual(columns["pid"], summaries.pids)
+        self.assertEqual(columns["difficulty"][0], summaries[0].difficulty)
+        problems = u.passed_problems[:2]
+        columns = problems.to_columns(["pid", "total_accepted"])
+        self.assertEqual(columns["pid"], summaries.pids[:2])
+        self.assertEqual(columns["total_accepted"][1], problems[1].total_accepted)
+        users = luogu.ModelList(luogu.User.fetch_many([1, 108135]))
+        columns, timestamps = luogu.columns.columns(users, ["uid", "register_time"])
+        self.assertEqual(columns["uid"], [1, 108135])
+        self.assertEqual(timestamps, {"register_time"})
+
+    def test_watch(self):
+        watcher = luogu.Watcher(interval=0)
+        watcher.watch_user(1)
+        watcher.watch_problem("P1001")
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.poll(limit=1), [])
+        watcher.unwatch(luogu.User, 1)
+        self.assertEqual(len(watcher), 1)
+
+    def test_lazy_list(self):
+        problems = luogu.User(108135).passed_problems[:3]
+        self.assertEqual(len(problems), 3)
+        self.assertIs(problems.prefetch(2)[1], problems[1])
+        problems.window = 2
+        self.assertEqual(list(problems), problems.materialize())
+        self.assertIs(next(iter(problems)), problems[0])
+
 
 class TestProblem(TestCase):
     def test_403(self):
@@ -82,6 +149,35 @@ class TestProblem(TestCase):
         self.assertEqual(p.pid, "P1001")
         self.assertEqual(repr(p), f"Problem({p.pid})")
 
+    def test_from_current_data(self):
+        p = luogu.Problem("P1001")
+        q = luogu.Problem.from_current_data(p._current_data)
+        self.assertEqual(q, p)
+        self.assertEqual(q.title, p.title)
+        self.assertEqual(q.samples, p.samples)
+        self.assertEqual(q.fingerprint, p.fingerprint)
+        self.assertEqual(len({p, q, luogu.Problem("P1000")}), 2)
+
+    def test_pickle(self):
+        s = luogu.Session()
+        p = s.Problem("P1001")
+        q = pickle.loads(pickle.dumps(p))
+        self.assertIs(type(q), luogu.Problem)
+        self.assertEqual(q, p)
+        self.assertEqual(luogu.Problem.from_dict(p.to_dict()), p)
+        models = s.User.load_many(luogu.User.dump_many([p, p.provider]))
+        self.assertEqual(models, [p, p.provider])
+        self.assertIsInstance(models[1], s.User)
+
+    def test_fetch_many(self):
+        pids = ["P1000", "P0001", "T1000", "P1001"]
+        results = list(luogu.Problem.fetch_many(pids, max_workers=2, rate=3))
+        self.assertEqual([pid for pid, _ in results], pids)
+        self.assertEqual(results[0][1], luogu.Problem("P1000"))
+        self.assertIsInstance(results[1][1], luogu.NotFoundHttpException)
+        self.assertIsInstance(results[2][1], luogu.AccessDeniedHttpException)
+        self.assertEqual(results[3][1].pid, "P1001")
+
     def test_attachment(self):
         attachment = luogu.Problem("P7912").attachments[0]
         self.assertIsInstance(attachment, luogu.Problem.Attachment)
@@ -98,6 +194,87 @@ class TestSession(TestCase):
         self.assertIs(s.User._session, s.session)
         self.assertIsNot(s.Problem._session, luogu.Problem._session)
 
+    def test_isolation(self):
+        a = luogu.Session("_uid=1")
+        b = luogu.Session("_uid=2")
+        self.assertIsNot(a.User, b.User)
+        self.assertIs(a.User._session, a.session)
+        self.assertIs(b.User._session, b.session)
+        self.assertIs(a.User._models[luogu.Problem], a.Problem)
+        self.assertTrue(issubclass(b.Paste, luogu.Paste))
+
+    def test_pool(self):
+        s = luogu.Session(pool_maxsize=32, timeout=10, keep_alive=False)
+        adapter = s.session.get_adapter("https://www.luogu.com.cn/")
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(adapter.timeout, 10)
+        self.assertEqual(s.session.headers["Connection"], "close")
+
+    def test_async(self):
+        async def fetch():
+            async with luogu.AsyncSession() as s:
+                self.assertIsNot(s.User, luogu.User)
+                u, p = await asyncio.gather(s.User.fetch(1), s.Problem.fetch("P1001"))
+                self.assertEqual(u, luogu.User(1))
+                self.assertEqual(p.pid, "P1001")
+                with self.assertRaises(luogu.NotFoundHttpException):
+                    await s.User.fetch(0)
+                self.assertIs(s.User(1), u)
+                with self.assertRaises(RuntimeError):
+                    s.User(2)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(fetch())
+        finally:
+            loop.close()
+
+    def test_cache(self):
+        cache = luogu.MemoryCache(maxsize=1)
+        s = luogu.Session(cache=cache)
+        uid = s.User(1).uid
+        self.assertEqual(s.User(1).uid, uid)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        s.User(2)
+        self.assertEqual(len(cache), 1)
+
+    def test_identity_map(self):
+        s = luogu.Session()
+        u = s.User(1)
+        self.assertIs(s.User("1"), u)
+        self.assertIsNot(luogu.User(1), u)
+        self.assertIs(u.refresh(), u)
+        self.assertEqual(u.name, "kkksc03")
+        self.assertIsInstance(s.Problem("P1001").provider, s.User)
+
+    def test_csrf_token(self):
+        s = luogu.Session()
+        token = csrf_tokens.get(s.session)
+        self.assertIsInstance(token, str)
+        self.assertIs(csrf_tokens.get(s.session), token)
+        csrf_tokens.invalidate(s.session)
+        self.assertIsInstance(csrf_tokens.get(s.session), str)
+
+    def test_mirror(self):
+        with luogu.Mirror(":memory:") as mirror:
+            self.assertEqual(mirror.sync_users([1, 2]), 2)
+            self.assertEqual(mirror.sync_users([1, 2], max_age=60), 0)
+            self.assertEqual(mirror.user(1).name, "kkksc03")
+            self.assertEqual(len(list(mirror.users())), 2)
+            self.assertRaises(luogu.NotFoundHttpException, mirror.problem, "P1001")
+
+    def test_metrics(self):
+        s = luogu.Session(cache=luogu.MemoryCache())
+        urls = []
+        s.hooks.request.append(lambda request: urls.append(request.url))
+        s.User(1)
+        s.User(1).refresh()
+        self.assertEqual(urls, ["https://www.luogu.com.cn/user/1"] * 2)
+        stats = s.metrics.as_dict()
+        self.assertEqual(stats["requests"]["GET /user/{id}"]["status"], {200: 2})
+        self.assertEqual(stats["cache"]["/user/{id}"], {"hits": 1, "misses": 1})
+        self.assertIn('luogu_requests_total{method="GET"', s.metrics.to_prometheus())
+
     def login(self, s: luogu.Session):
         r = requests.post(
             "https://luogu-captcha-bypass.piterator.com/predict",
@@ -129,7 +306,363 @@ class TestSession(TestCase):
         self.assertEqual(p.public, False)
         self.assertEqual(p.delete(), p.id)
 
+        pastes = list(s.Paste.new_many(["Hello", "Luogu"], max_workers=2))
+        self.assertEqual([p.data for p in pastes], ["Hello", "Luogu"])
+        self.assertEqual(pastes[0].refresh().data, "Hello")
+        for p in pastes:
+            p.delete()
+
+        key = b"0" * 43 + b"="
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "session.bin")
+            s.save(path, key)
+            t = luogu.Session.load(path, key)
+        self.assertEqual(t.uid, s.uid)
+        self.assertTrue(t.validate())
+        with luogu.SessionPool([t], revalidate=0).checkout() as u:
+            self.assertIs(u, t)
+
         self.assertTrue(s.logout()["_empty"])
+        self.assertFalse(luogu.Session().validate())
+
+
+class LocalHandler(Handler):
+    fail = None
+    etag = None
+    retry_after = None
+
+    def end_headers(self):
+        if self.etag is not None:
+            self.send_header("ETag", self.etag)
+        super().end_headers()
+
+    def do_GET(self):
+        if self.retry_after is not None:
+            self.send_response(429)
+            self.send_header("Retry-After", self.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.etag is not None and self.headers["If-None-Match"] == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if self.fail is not None and re.search(self.fail, self.path):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_GET()
+
+
+class TestLocal(unittest.TestCase):
+    """使用 :mod:`benchmarks.server` 的本地测试"""
+
+    def setUp(self):
+        self.handler = type(
+            "Handler", (LocalHandler,), {"user": copy.deepcopy(Handler.user)}
+        )
+        server = serve(handler=self.handler)
+        self.url = server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        self.session = luogu.Session(backoff=None)
+        patch(self.session.session, self.url)
+
+    def test_identity_map(self):
+        with ThreadPoolExecutor(8) as executor:
+            users = list(executor.map(lambda _: self.session.User(1), range(8)))
+        self.assertTrue(all(u is users[0] for u in users))
+
+        async def fetch():
+            async with luogu.AsyncSession(backoff=None) as s:
+                patch_async(s.client, self.url)
+                users = await asyncio.gather(*(s.User.fetch(1) for _ in range(10)))
+                self.assertTrue(all(u is users[0] for u in users))
+                self.handler.user["currentData"]["user"]["ranking"] = 1
+                self.assertEqual(users[0].ranking, 1024)
+                self.assertIs(await s.User.fetch(1), users[0])
+                self.assertEqual(users[0].ranking, 1024)
+                self.assertIs(await s.User.fetch(1, refresh=True), users[0])
+                self.assertEqual(users[0].ranking, 1)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(fetch())
+        finally:
+            loop.close()
+
+    def test_watch(self):
+        watcher = luogu.Watcher(
+            self.session, interval=0.2, min_interval=0.05, max_interval=1
+        )
+        watcher.watch_user(1)
+        target = watcher._targets[(luogu.User, "1")]
+        self.assertEqual(watcher.poll(), [])
+        user = self.handler.user["currentData"]["user"]
+        user["ranking"] = 1
+        sleep(0.2)
+        self.assertEqual(
+            watcher.poll(), [luogu.watch.Change(luogu.User, 1, "ranking", 1024, 1)]
+        )
+        self.assertAlmostEqual(target.interval, 0.1)
+        sleep(0.1)
+        self.assertEqual(watcher.poll(), [])
+        self.assertAlmostEqual(target.interval, 0.15)
+        self.handler.fail = "^/user/"
+        sleep(0.15)
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(len(watcher._schedule), 1)
+        self.handler.fail = None
+        user["ranking"] = 2
+        sleep(0.15)
+        self.assertEqual(
+            watcher.poll(), [luogu.watch.Change(luogu.User, 1, "ranking", 1, 2)]
+        )
+
+    def test_mirror(self):
+        self.handler.problem_count = 120
+        self.handler.submissions = {}
+        with luogu.Mirror(":memory:", self.session) as mirror:
+            self.handler.fail = r"^/problem/list\?page=2\b"
+            with self.assertRaises(requests.HTTPError):
+                mirror.sync_problems()
+            self.assertEqual(len(mirror), 50)
+            self.handler.fail = None
+            self.assertEqual(mirror.sync_problems(), 70)
+            self.assertEqual(len(list(mirror.problems())), 120)
+            self.assertEqual(mirror.sync_problems(), 0)
+            self.handler.submissions["P1005"] = 1
+            self.assertEqual(mirror.sync_problems(), 1)
+            self.assertEqual(mirror.problem("P1005").pid, "P1005")
+            self.assertEqual(mirror.sync_problems(full=True), 120)
+
+    def test_cache_evicted(self):
+        self.handler.etag = '"1"'
+        cache = luogu.MemoryCache(maxsize=1, ttl=0)
+        s = luogu.Session(cache=cache, backoff=None)
+        patch(s.session, self.url)
+        url = "https://www.luogu.com.cn/user/1"
+        data = s.User._get(url)
+        self.assertEqual(s.User._get(url), data)
+        self.assertEqual(cache.revalidations, 1)
+        lookup = cache.lookup
+
+        def evicting_lookup(key):
+            result = lookup(key)
+            cache.clear()
+            return result
+
+        cache.lookup = evicting_lookup
+        self.assertEqual(s.User._get(url), data)
+        self.assertEqual(cache.revalidations, 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_retry_after(self):
+        self.handler.retry_after = "86400"
+        s = luogu.Session(backoff=luogu.Backoff(max_delay=1))
+        patch(s.session, self.url)
+        retries = []
+        s.hooks.retry.append(lambda *args: retries.append(args))
+        start = monotonic()
+        r = s.session.get("https://www.luogu.com.cn/user/1")
+        self.assertEqual(r.status_code, 429)
+        self.assertLess(monotonic() - start, 1)
+        self.assertEqual(retries, [])
+
+    def test_fetch_many(self):
+        read = []
+
+        def ids():
+            for i in range(100):
+                read.append(i)
+                yield f"P{1000 + i}"
+
+        results = self.session.Problem.fetch_many(ids(), max_workers=2)
+        pid, problem = next(results)
+        self.assertEqual(pid, "P1000")
+        self.assertLessEqual(len(read), 5)
+        problem = weakref.ref(problem)
+        pids = [pid for pid, _ in results]
+        self.assertEqual(pids, [f"P{1000 + i}" for i in range(1, 100)])
+        gc.collect()
+        self.assertIsNone(problem())
+        unordered = self.session.Problem.fetch_many(ids(), ordered=False)
+        self.assertEqual(len(list(unordered)), 100)
+
+    def test_lazy_list_maxsize(self):
+        problems = self.session.User(1).passed_problems
+        problems.maxsize = 1
+        urls = []
+        self.session.hooks.request.append(lambda request: urls.append(request.url))
+        first = problems[0]
+        second = weakref.ref(problems[1])
+        self.assertIs(problems[0], first)
+        self.assertEqual(len(urls), 2)
+        gc.collect()
+        self.assertIsNone(second())
+        self.assertIs(pickle.loads(pickle.dumps(problems)).maxsize, 1)
+
+    def test_pickle(self):
+        u = self.session.User(1)
+        for obj in (
+            u.passed_problems,
+            u.passed_problem_summaries,
+            u.passed_problem_summaries[0],
+            luogu.User.Summary(self.session.User, {"uid": 1, "name": "x"}),
+        ):
+            loaded = pickle.loads(pickle.dumps(obj))
+            self.assertIs(type(loaded), type(obj))
+            self.assertIs(loaded._model._public_model(), loaded._model)
+        problems = pickle.loads(pickle.dumps(u.passed_problems))
+        self.assertIs(problems._model, luogu.Problem)
+        self.assertEqual(repr(problems), repr(u.passed_problems))
+
+
+class TestUtils(unittest.TestCase):
+    def test_cached_method(self):
+        class Foo:
+            calls = 0
+
+            @cached_method(maxsize=2)
+            def bar(self, *args, **kwargs):
+                self.calls += 1
+                return args, kwargs
+
+        foo = Foo()
+        self.assertIs(foo.bar(1, x=[2]), foo.bar(1, x=[2]))
+        self.assertEqual(foo.calls, 1)
+        foo.bar(2)
+        foo.bar(3)
+        foo.bar(1, x=[2])
+        self.assertEqual(foo.calls, 4)
+        foo.bar.invalidate(3)
+        foo.bar(3)
+        self.assertEqual(foo.calls, 5)
+        foo.bar.cache_clear()
+        foo.bar(3)
+        self.assertEqual(foo.calls, 6)
+        self.assertIsNot(Foo().bar(3), foo.bar(3))
+
+        class Baz:
+            def __init__(self, maxsize):
+                self.maxsize = maxsize
+
+            @cached_method(maxsize="maxsize", weak=True)
+            def get(self, x):
+                return Foo()
+
+        baz = Baz(1)
+        kept = baz.get(1)
+        dropped = weakref.ref(baz.get(2))
+        self.assertIs(baz.get(1), kept)
+        gc.collect()
+        self.assertIsNone(dropped())
+
+    def test_metrics(self):
+        from luogu.metrics import endpoint
+
+        self.assertEqual(
+            endpoint("https://www.luogu.com.cn/paste/1a2b?x=1"), "/paste/{id}"
+        )
+        self.assertEqual(
+            endpoint("https://www.luogu.com.cn/api/user/search"), "/api/user/search"
+        )
+
+    def test_extract_csrf_token(self):
+        html = b'<head><meta charset="UTF-8"><meta name="csrf-token" content="a:b">'
+        chunks = [html[i : i + 5] for i in range(0, len(html), 5)]
+        self.assertEqual(extract_csrf_token(iter(chunks + [None])), "a:b")
+        self.assertIsNone(extract_csrf_token([b"<head></head><body>"]))
+
+    def test_field(self):
+        p = luogu.Problem.from_current_data({"problem": {"pid": "X"}})
+        self.assertFalse(hasattr(p, "title"))
+        self.assertIsNone(getattr(p, "title", None))
+        self.assertEqual(p.pid, "X")
+
+    def test_project(self):
+        data = {"code": 200, "currentData": {"problems": [{"pid": "P1001", "x": 1}]}}
+        schema = {"currentData": {"problems": [{"pid": None}]}}
+        self.assertEqual(
+            project(data, schema), {"currentData": {"problems": [{"pid": "P1001"}]}}
+        )
+        self.assertIs(project(data, None), data)
+        raw = json.dumps(data).encode()
+        self.assertEqual(decode(raw, schema), project(data, schema))
+        self.assertEqual(decode(raw), data)
+        self.assertEqual(
+            decode(b'{"currentData": null}', schema), {"currentData": None}
+        )
+
+    def test_single_flight(self):
+        flights = SingleFlight()
+        calls = []
+
+        def func():
+            calls.append(None)
+            sleep(0.1)
+            return object()
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda _: flights.do("key", func), range(4)))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+        async def coro():
+            calls.append(None)
+            await asyncio.sleep(0.1)
+            return object()
+
+        async def main():
+            return await asyncio.gather(
+                *(flights.do_async("key", coro) for _ in range(4))
+            )
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(main())
+        finally:
+            loop.close()
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(r is results[0] for r in results))
+
+        async def cancel_leader():
+            leader = asyncio.ensure_future(flights.do_async("key", coro))
+            follower = asyncio.ensure_future(flights.do_async("key", coro))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertIsNotNone(loop.run_until_complete(cancel_leader()))
+        finally:
+            loop.close()
+        self.assertEqual(len(calls), 3)
+
+    def test_token_bucket(self):
+        bucket = luogu.TokenBucket(50, adaptive=True)
+        start = monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(monotonic() - start, 0.09)
+        bucket.feedback(429)
+        self.assertEqual(bucket.rate, 25)
+        for _ in range(20):
+            bucket.feedback(200)
+        self.assertEqual(bucket.rate, 50)
+
+    def test_backoff(self):
+        backoff = luogu.Backoff(retries=2, max_delay=1)
+        self.assertTrue(backoff.should_retry("GET", 503, 1))
+        self.assertFalse(backoff.should_retry("GET", 503, 2))
+        self.assertFalse(backoff.should_retry("POST", 503, 0))
+        self.assertTrue(backoff.should_retry("POST", 429, 0))
+        self.assertEqual(backoff.delay(0, {"Retry-After": "1"}), 1)
+        self.assertIsNone(backoff.delay(0, {"Retry-After": "2"}))
+        self.assertLessEqual(backoff.delay(5, {}), 1)
 
 
 if __name__ == "__main__":